@@ -0,0 +1,250 @@
+# api_server.py
+# Schreibgeschützte JSON-API für Dashboards, getrennt von der Streamlit-Oberfläche.
+#
+#   python Lernzeit_tracker/api_server.py --port 8502 --daten daten.csv
+#   uvicorn api_server:asgi_app            (ASGI, Datenpfad über LERNZEIT_DATEN)
+#
+# Endpunkte (alle GET, Parameter von/bis als JJJJ-MM-TT, fach optional):
+#   /api/kennzahlen                              Heute / Woche / Gesamt in Minuten
+#   /api/tage?von=&bis=&fach=                    Minuten pro Tag
+#   /api/wochen?von=&bis=&fach=                  Minuten pro Kalenderwoche
+#   /api/eintraege?von=&bis=&fach=&seite=&pro_seite=
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import auswertung
+from data_manager import LernzeitDaten
+from kalender import Kalender
+
+MAX_PRO_SEITE = 500
+GZIP_AB_BYTES = 1024
+
+
+class ApiFehler(Exception):
+    def __init__(self, status, meldung):
+        super().__init__(meldung)
+        self.status = status
+
+
+def _param(query, name, default=None):
+    return query.get(name, [default])[0]
+
+
+def _datum_param(query, name):
+    wert = _param(query, name)
+    if not wert:
+        return None
+    try:
+        return date.fromisoformat(wert)
+    except ValueError:
+        raise ApiFehler(400, f"'{name}' muss ein Datum im Format JJJJ-MM-TT sein")
+
+
+def _int_param(query, name, default, minimum=1, maximum=None):
+    try:
+        wert = int(_param(query, name, default))
+    except (TypeError, ValueError):
+        raise ApiFehler(400, f"'{name}' muss eine ganze Zahl sein")
+    if wert < minimum or (maximum is not None and wert > maximum):
+        raise ApiFehler(400, f"'{name}' muss zwischen {minimum} und {maximum or '∞'} liegen")
+    return wert
+
+
+def _gefiltert(df, query):
+    # von/bis beziehen sich auf Lerntage (Spalte "Tag")
+    von, bis, fach = _datum_param(query, "von"), _datum_param(query, "bis"), _param(query, "fach")
+    if df.empty:
+        return df
+    maske = df["Tag"] == df["Tag"]
+    if von:
+        maske &= df["Tag"] >= Kalender.tag(von)
+    if bis:
+        maske &= df["Tag"] <= Kalender.tag(bis)
+    if fach:
+        maske &= df["Fach"] == fach
+    return df[maske]
+
+
+def _kennzahlen(df, query, heute):
+    return auswertung.kennzahlen(df, heute)
+
+
+def _tage(df, query, heute):
+    reihe = auswertung.tagesreihe(_gefiltert(df, query))
+    return [{"datum": tag.isoformat(), "minuten": int(minuten)} for tag, minuten in reihe.items()]
+
+
+def _wochen(df, query, heute):
+    g = auswertung.wochenreihe(_gefiltert(df, query))
+    return [
+        {"jahr": int(r["Jahr"]), "kw": int(r["KW"]), "label": r["Label"], "minuten": int(r["Dauer (Minuten)"])}
+        for r in g.to_dict("records")
+    ]
+
+
+def _eintraege(df, query, heute):
+    dff = _gefiltert(df, query).sort_values("Datum", ascending=False)
+    pro_seite = _int_param(query, "pro_seite", 50, maximum=MAX_PRO_SEITE)
+    seite = _int_param(query, "seite", 1)
+    teil = dff.iloc[(seite - 1) * pro_seite:seite * pro_seite]
+    return {
+        "seite": seite,
+        "pro_seite": pro_seite,
+        "gesamt": len(dff),
+        "seiten": max(1, -(-len(dff) // pro_seite)),
+        "eintraege": [
+            {
+                "id": str(r["ID"]),
+                "fach": r["Fach"],
+                "minuten": int(r["Dauer (Minuten)"]),
+                "datum": Kalender.datum(r["Tag"]).isoformat(),
+                "notiz": r["Notiz"],
+            }
+            for r in teil.to_dict("records")
+        ],
+    }
+
+
+ROUTEN = {
+    "/api/kennzahlen": _kennzahlen,
+    "/api/tage": _tage,
+    "/api/wochen": _wochen,
+    "/api/eintraege": _eintraege,
+}
+
+
+class LernzeitApi:
+    # Hält eine LernzeitDaten-Instanz; geparst wird nur beim Start und wenn sich die Dateien ändern.
+    # Antworten werden pro Generation und Lerntag zwischengespeichert, wiederholtes Abfragen kostet dann nur einen Lookup.
+    def __init__(self, daten):
+        self.daten = daten
+        self._cache = {}
+        self._cache_generation = None
+
+    def _body(self, pfad, query_text):
+        with self.daten.sperre:
+            self.daten.neu_laden_falls_geaendert()
+            kalender = self.daten.kalender
+            heute = kalender.heute()
+            # "Heute"/"Woche" wechseln mit dem Lerntag (und mit Zeitzone/Tagesbeginn), auch ohne neue Einträge
+            generation = (self.daten.generation, heute, kalender.zeitzone, kalender.tagesbeginn)
+            if generation != self._cache_generation:
+                self._cache = {}
+                self._cache_generation = generation
+            schluessel = (pfad, query_text)
+            if schluessel not in self._cache:
+                daten = ROUTEN[pfad](self.daten.df, parse_qs(query_text), heute)
+                body = json.dumps(daten, ensure_ascii=False).encode("utf-8")
+                etag = '"%s"' % hashlib.sha1(
+                    f"{generation}|{self.daten._signatur}|{pfad}?{query_text}".encode()
+                ).hexdigest()[:20]
+                self._cache[schluessel] = (etag, body, None)
+            return schluessel, self._cache[schluessel]
+
+    def antwort(self, pfad, query_text, header):
+        # Liefert (Status, Header, Body); header sind die Request-Header mit kleingeschriebenen Namen
+        if pfad not in ROUTEN:
+            return self._fehler(404, "Unbekannter Endpunkt")
+        try:
+            schluessel, (etag, body, body_gzip) = self._body(pfad, query_text)
+        except ApiFehler as e:
+            return self._fehler(e.status, str(e))
+        kopf = {
+            "Content-Type": "application/json; charset=utf-8",
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if etag in [t.strip() for t in header.get("if-none-match", "").split(",")]:
+            return 304, kopf, b""
+        if "gzip" in header.get("accept-encoding", "") and len(body) >= GZIP_AB_BYTES:
+            if body_gzip is None:
+                body_gzip = gzip.compress(body)
+                with self.daten.sperre:
+                    if schluessel in self._cache:
+                        self._cache[schluessel] = (etag, body, body_gzip)
+            kopf["Content-Encoding"] = "gzip"
+            body = body_gzip
+        kopf["Content-Length"] = str(len(body))
+        return 200, kopf, body
+
+    @staticmethod
+    def _fehler(status, meldung):
+        body = json.dumps({"fehler": meldung}, ensure_ascii=False).encode("utf-8")
+        return status, {"Content-Type": "application/json; charset=utf-8", "Content-Length": str(len(body))}, body
+
+
+def handler_fuer(api):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            header = {k.lower(): v for k, v in self.headers.items()}
+            status, kopf, body = api.antwort(url.path.rstrip("/"), url.query, header)
+            self.send_response(status)
+            for name, wert in kopf.items():
+                self.send_header(name, wert)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def asgi_app_fuer(api):
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        header = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        if scope["method"] != "GET":
+            status, kopf, body = api._fehler(405, "Nur GET erlaubt")
+        else:
+            status, kopf, body = api.antwort(scope["path"].rstrip("/"), scope["query_string"].decode(), header)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.lower().encode(), v.encode()) for k, v in kopf.items()],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+class _AsgiVerzoegert:
+    # Lädt die Daten erst beim ersten Request, damit ein Import des Moduls nichts anlegt
+    def __init__(self):
+        self._app = None
+
+    async def __call__(self, scope, receive, send):
+        if self._app is None:
+            self._app = asgi_app_fuer(LernzeitApi(LernzeitDaten(os.environ.get("LERNZEIT_DATEN", "daten.csv"), nur_lesen=True)))
+        await self._app(scope, receive, send)
+
+
+asgi_app = _AsgiVerzoegert()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lernzeit-Tracker JSON-API (nur lesend)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--daten", default="daten.csv", help="Pfad zur daten.csv")
+    args = parser.parse_args()
+
+    api = LernzeitApi(LernzeitDaten(args.daten, nur_lesen=True))
+    server = ThreadingHTTPServer((args.host, args.port), handler_fuer(api))
+    print(f"Lernzeit-API läuft auf http://{args.host}:{args.port}/api/kennzahlen")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
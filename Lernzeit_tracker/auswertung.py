@@ -0,0 +1,81 @@
+# auswertung.py
+import pandas as pd
+
+from kalender import Kalender, KEIN_TAG
+
+# Periodenbeginn je Raster: Woche beginnt montags, Monat am Ersten
+# Gruppiert wird überall auf den Lerntag-Schlüsseln "Tag"/"KW" (siehe kalender.py), nicht auf "Datum"
+PERIODEN = {"Woche": ("W-SUN", "W-MON"), "Monat": ("M", "MS")}
+
+
+class FachWuerfel:
+    # Minuten je (Periode × Fach) für Woche und Monat, einmal vektorisiert aufgebaut
+    # und danach bei jedem Einfügen/Ändern/Löschen nur um die betroffenen Zeilen korrigiert.
+    def __init__(self, df=None):
+        self.neu_aufbauen(df if df is not None else pd.DataFrame(columns=["Fach", "Dauer (Minuten)", "Tag"]))
+
+    @staticmethod
+    def _aggregieren(df, raster):
+        df = df[df["Tag"] != KEIN_TAG]
+        if df.empty:
+            return pd.DataFrame(dtype="float64", index=pd.DatetimeIndex([], name="Periode"))
+        lerntag = pd.to_datetime(df["Tag"].astype("int64"), unit="D")
+        periode = lerntag.dt.to_period(PERIODEN[raster][0]).dt.start_time
+        minuten = pd.to_numeric(df["Dauer (Minuten)"], errors="coerce").fillna(0)
+        cube = minuten.groupby([periode.rename("Periode"), df["Fach"].rename("Fach")]).sum().unstack(fill_value=0)
+        return cube.astype("float64")
+
+    def neu_aufbauen(self, df):
+        self.cubes = {raster: self._aggregieren(df, raster) for raster in PERIODEN}
+
+    def hinzufuegen(self, df, vorzeichen=1):
+        for raster, cube in self.cubes.items():
+            teil = self._aggregieren(df, raster)
+            if teil.empty:
+                continue
+            self.cubes[raster] = cube.add(vorzeichen * teil, fill_value=0).fillna(0).sort_index()
+
+    def entfernen(self, df):
+        self.hinzufuegen(df, vorzeichen=-1)
+
+    def reihe(self, raster="Woche", von=None, bis=None):
+        # Lückenlose Perioden (auch ohne Einträge) für Trends und Vorperioden-Vergleiche
+        cube = self.cubes[raster]
+        cube = cube.loc[:, cube.sum() > 0]
+        if cube.empty:
+            return cube
+        start = pd.Timestamp(von) if von is not None else cube.index.min()
+        ende = pd.Timestamp(bis) if bis is not None else cube.index.max()
+        start = start.to_period(PERIODEN[raster][0]).start_time
+        perioden = pd.date_range(start, ende, freq=PERIODEN[raster][1], name="Periode")
+        return cube.reindex(perioden, fill_value=0)
+
+    def summe_je_fach(self):
+        summe = self.cubes["Monat"].sum()
+        return summe[summe > 0].sort_values(ascending=False)
+
+
+def kennzahlen(df, heute):
+    # heute: aktueller Lerntag (Kalender.heute())
+    if df.empty:
+        return {"heute": 0, "woche": 0, "gesamt": 0}
+    tag = Kalender.tag(heute)
+    return {
+        "heute": int(df.loc[df["Tag"] == tag, "Dauer (Minuten)"].sum()),
+        "woche": int(df.loc[df["KW"] == Kalender.wochen([tag])[0], "Dauer (Minuten)"].sum()),
+        "gesamt": int(df["Dauer (Minuten)"].sum()),
+    }
+
+
+def tagesreihe(df):
+    reihe = df[df["Tag"] != KEIN_TAG].groupby("Tag")["Dauer (Minuten)"].sum()
+    reihe.index = pd.Index(pd.to_datetime(reihe.index.astype("int64"), unit="D").date, name="Datum")
+    return reihe
+
+
+def wochenreihe(df):
+    g = df[df["KW"] > 0].groupby("KW")["Dauer (Minuten)"].sum().reset_index()
+    g.insert(0, "Jahr", g["KW"] // 100)
+    g["KW"] = g["KW"] % 100
+    g["Label"] = g["Jahr"].astype(str) + "-KW" + g["KW"].astype(str)
+    return g
@@ -0,0 +1,142 @@
+# bericht_manager.py
+# Mehrblättrige Excel-Berichte: Übersicht, ein Blatt je Fach, Wochenzusammenfassung, Zielerreichung.
+# Die Blatt-Inhalte werden parallel in einem Prozess-Pool berechnet, das Workbook danach
+# in einem Hintergrund-Thread zusammengesetzt – die Streamlit-Session bleibt bedienbar.
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from io import BytesIO
+
+import pandas as pd
+
+from export_manager import ExportManager
+
+STANDARD_TAGESZIEL = 90
+
+
+# ------------- Blatt-Inhalte (laufen in Worker-Prozessen) -------------
+def _uebersicht_blatt(df):
+    g = df.groupby("Fach")["Dauer (Minuten)"].agg(["sum", "count", "mean"]).reset_index()
+    g.columns = ["Fach", "Dauer (Minuten)", "Einträge", "Ø Minuten"]
+    g["Ø Minuten"] = g["Ø Minuten"].round(1)
+    return g.sort_values("Dauer (Minuten)", ascending=False)
+
+
+def _fach_blatt(df_fach):
+    return df_fach.sort_values("Datum")[["Datum", "Dauer (Minuten)", "Notiz"]]
+
+
+def _wochen_blatt(df):
+    # Gruppiert auf dem Lerntag-Schlüssel KW (ISO-Jahr * 100 + Woche)
+    g = df.pivot_table(index=[(df["KW"] // 100).rename("Jahr"), (df["KW"] % 100).rename("KW")], columns="Fach",
+                       values="Dauer (Minuten)", aggfunc="sum", fill_value=0)
+    g["Dauer (Minuten)"] = g.sum(axis=1)
+    return g.reset_index()
+
+
+def _ziel_blatt(df, ziele_df):
+    tage = df.groupby("Tag")["Dauer (Minuten)"].sum().rename("Minuten")
+    tage.index = pd.to_datetime(tage.index.astype("int64"), unit="D").rename("Datum")
+    ziele = pd.Series(dtype="float64")
+    if not ziele_df.empty:
+        ziele = ziele_df.assign(Datum=pd.to_datetime(ziele_df["Datum"]).dt.normalize()) \
+                        .drop_duplicates("Datum", keep="last").set_index("Datum")["Tagesziel"]
+    g = tage.to_frame()
+    # Tage ohne gespeichertes Ziel übernehmen das zuletzt gesetzte Ziel
+    g["Tagesziel"] = ziele.reindex(g.index.union(ziele.index)).ffill().reindex(g.index) \
+                          .fillna(STANDARD_TAGESZIEL).astype(float)
+    g["Erreicht %"] = (g["Minuten"] / g["Tagesziel"] * 100).round(1)
+    g["Erreicht"] = g["Minuten"] >= g["Tagesziel"]
+    return g.reset_index().rename(columns={"index": "Datum"})
+
+
+def _blattname(name, vergeben):
+    name = re.sub(r"[\[\]:*?/\\]", "_", str(name))[:31] or "Fach"
+    basis, n = name, 2
+    while name.lower() in vergeben:
+        endung = f" ({n})"
+        name = basis[:31 - len(endung)] + endung
+        n += 1
+    vergeben.add(name.lower())
+    return name
+
+
+def _aufgaben(df, ziele_df):
+    # (Blattname, Funktion, Argumente) – Reihenfolge = Reihenfolge im Workbook
+    vergeben = {"übersicht", "wochen", "zielerreichung"}
+    aufgaben = [("Übersicht", _uebersicht_blatt, (df,))]
+    for fach, df_fach in df.groupby("Fach", sort=True):
+        aufgaben.append((_blattname(fach, vergeben), _fach_blatt, (df_fach,)))
+    aufgaben.append(("Wochen", _wochen_blatt, (df,)))
+    aufgaben.append(("Zielerreichung", _ziel_blatt, (df, ziele_df)))
+    return aufgaben
+
+
+def bericht_erstellen(df, ziele_df, fortschritt=None, max_workers=None):
+    # Synchron; fortschritt(anteil, text) wird nach jedem fertigen Blatt aufgerufen
+    fortschritt = fortschritt or (lambda anteil, text: None)
+    df = df.copy()
+    df["Datum"] = pd.to_datetime(df["Datum"])
+    aufgaben = _aufgaben(df, ziele_df)
+    ergebnisse = {}
+    schritte = len(aufgaben) + 1
+    fortschritt(0.0, "Worker-Prozesse werden gestartet …")
+    try:
+        # "spawn": Forken aus dem mehrfädigen Streamlit-Prozess kann Sperren im Kind hängen lassen
+        pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+    except (OSError, NotImplementedError):
+        pool = None
+    if pool is None:
+        # Ohne Prozess-Pool (z. B. eingeschränkte Umgebung) seriell rechnen
+        for i, (name, funktion, args) in enumerate(aufgaben, 1):
+            ergebnisse[name] = funktion(*args)
+            fortschritt(i / schritte, f"Blatt „{name}“ berechnet")
+    else:
+        with pool:
+            futures = {pool.submit(funktion, *args): name for name, funktion, args in aufgaben}
+            for i, future in enumerate(as_completed(futures), 1):
+                ergebnisse[futures[future]] = future.result()
+                fortschritt(i / schritte, f"Blatt „{futures[future]}“ berechnet")
+
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer, engine="xlsxwriter", datetime_format="dd.mm.yyyy") as writer:
+        for name, _, _ in aufgaben:
+            ExportManager.blatt_schreiben(writer, ergebnisse[name], name)
+    buffer.seek(0)
+    fortschritt(1.0, "Workbook erstellt")
+    return buffer, f"lernzeit_bericht_{datetime.now():%Y%m%d_%H%M}.xlsx"
+
+
+class BerichtJob:
+    # Läuft in einem Daemon-Thread; Status/Fortschritt können bei jedem Rerun abgefragt werden
+    def __init__(self, df, ziele_df, max_workers=None):
+        self.status = "wartet"
+        self.fortschritt = 0.0
+        self.meldung = ""
+        self.buffer = None
+        self.dateiname = None
+        self.fehler = None
+        self._thread = threading.Thread(target=self._laufen, args=(df, ziele_df, max_workers), daemon=True)
+
+    def starten(self):
+        self.status = "läuft"
+        self._thread.start()
+        return self
+
+    def _melden(self, anteil, text):
+        self.fortschritt = anteil
+        self.meldung = text
+
+    def _laufen(self, df, ziele_df, max_workers):
+        try:
+            self.buffer, self.dateiname = bericht_erstellen(df, ziele_df, self._melden, max_workers)
+            self.status = "fertig"
+        except Exception as e:
+            self.fehler = f"{type(e).__name__}: {e}"
+            self.status = "fehler"
+
+    @property
+    def laeuft(self):
+        return self.status == "läuft"
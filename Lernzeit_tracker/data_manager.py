@@ -1,29 +1,476 @@
+import os
+import json
+import shutil
+import threading
+from functools import wraps
 import pandas as pd
 from datetime import datetime, timedelta
 
+import speicherformat
+import spalten_cache
+from auswertung import FachWuerfel
+from notizsuche import NotizIndex
+from kalender import Kalender
+
+SPALTEN = ["ID","Fach","Dauer (Minuten)","Datum","Notiz","Tagesziel"]
+JOURNAL_SPALTEN = ["Aktion"] + SPALTEN
+RUECKGAENGIG_FENSTER = timedelta(hours=24)
+AUFBEWAHRUNG_TAGE = 180
+
+
+def _filter_fuer(von=None, faecher=None):
+    # Prädikate werden auf jedes gelesene Teilstück angewendet, nicht erst auf den ganzen Frame
+    def filtern(chunk):
+        chunk["Datum"] = pd.to_datetime(chunk["Datum"], format="ISO8601", errors="coerce")
+        maske = chunk["Datum"].notna()
+        if von is not None:
+            maske &= chunk["Datum"] >= von
+        if faecher is not None:
+            maske &= chunk["Fach"].isin(faecher)
+        return chunk[maske]
+    return filtern
+
+
+def _gesperrt(methode):
+    # Die Instanz wird zwischen Streamlit-Sessions bzw. API-Threads geteilt
+    @wraps(methode)
+    def wrapper(self, *args, **kwargs):
+        with self.sperre:
+            return methode(self, *args, **kwargs)
+    return wrapper
+
+
+def lade_eintraege(pfad, von=None, faecher=None, quarantaene_pfad=None):
+    return speicherformat.lesen(pfad, quarantaene_pfad, chunk_filter=_filter_fuer(von, faecher))
+
+
 class LernzeitDaten:
-    def __init__(self, pfad="daten.csv"):
+    def __init__(self, pfad="daten.csv", tage=AUFBEWAHRUNG_TAGE, faecher=None, nur_lesen=False):
         self.pfad = pfad
+        # Lesende Prozesse (z. B. die JSON-API) migrieren/kompaktieren nie und schreiben nichts
+        self.nur_lesen = nur_lesen
+        self.tage = tage
+        # Mit Fächer-Filter ist nur ein Ausschnitt geladen, dann darf die CSV nie komplett neu geschrieben werden
+        self.faecher = list(faecher) if faecher is not None else None
+        # Änderungen und Löschungen landen als Zeilen im Journal statt die CSV neu zu schreiben
+        self.journal_pfad = os.path.splitext(pfad)[0] + "_journal.csv"
+        # Reset/Massenlöschung verschieben Dateien nur ins Archiv, die Epoche merkt sich den Stand
+        self.archiv_pfad = os.path.splitext(pfad)[0] + "_archiv"
+        self.epoche_pfad = os.path.splitext(pfad)[0] + "_epoche.json"
+        self.kalender_pfad = os.path.splitext(pfad)[0] + "_kalender.json"
+        self.quarantaene_pfad = pfad + ".quarantaene"
+        # Binärer Spalten-Cache für schnelle Neustarts (siehe spalten_cache.py)
+        self.cache_pfad = pfad + ".spalten"
+        self.aus_cache = False
+        self.ladefehler = None
+        self.integritaet = {}
         self.df = pd.DataFrame()
+        self._index = {}
+        self.wuerfel = FachWuerfel()
+        self.notizindex = NotizIndex()
+        # Generation zählt jede Änderung; Caches (z. B. die JSON-API) hängen daran
+        self.generation = 0
+        self._signatur = None
+        self.sperre = threading.RLock()
         self._lade_oder_erzeuge_csv()
 
     def _lade_oder_erzeuge_csv(self):
+        with self.sperre:
+            # Signatur vor dem Lesen: was währenddessen geschrieben wird, löst den nächsten Neuladen aus
+            # (schreibt _laden selbst, setzt speichern() die Signatur neu)
+            self._signatur = self._dateisignatur()
+            # Auch neu lesen, wenn ein anderer Prozess nur Zeitzone/Tagesbeginn geändert hat
+            self.kalender = Kalender.laden(self.kalender_pfad)
+            self._laden()
+            self.kalender.schluessel_setzen(self.df)
+            self.wuerfel.neu_aufbauen(self.df)
+            self.notizindex.zuruecksetzen()
+            self.generation += 1
+            if not self.aus_cache:
+                self.cache_aktualisieren()
+
+    def _von(self):
+        return pd.Timestamp(self.kalender.jetzt() - timedelta(days=self.tage)) if self.tage else None
+
+    def _aus_cache_laden(self, von):
+        df = spalten_cache.laden(self.cache_pfad, self._dateisignatur(self._datendateien()), von)
+        if df is None:
+            return False
+        if self.faecher is not None:
+            df = df[df["Fach"].isin(self.faecher)].reset_index(drop=True)
+        self.df = df
+        self._index_aufbauen()
+        self.integritaet = {"version": speicherformat.VERSION, "bloecke": None, "defekt": 0, "quelle": "cache"}
+        return True
+
+    def cache_aktualisieren(self):
+        # Nur vollständige, beschreibbare Bestände cachen; Fehler sind unkritisch (Cache ist optional)
+        if self.faecher is not None or self.nur_lesen:
+            return "übersprungen"
+        with self.sperre:
+            # Nur cachen, was zu den Dateien passt; hat ein anderer Prozess geschrieben, erst neu laden
+            self.neu_laden_falls_geaendert()
+            if self.ladefehler:
+                return "übersprungen"
+            signatur = self._dateisignatur(self._datendateien())
+            if spalten_cache.ist_aktuell(self.cache_pfad, signatur, self._von()):
+                return "aktuell"
+            try:
+                spalten_cache.schreiben(self.cache_pfad, self.df, signatur, self._von())
+            except OSError as e:
+                return f"nicht geschrieben ({e})"
+            return f"{len(self.df)} Zeilen geschrieben"
+
+    def _datendateien(self):
+        # Der Spalten-Cache hängt nur an den Daten; Tag/KW werden nach dem Laden berechnet
+        return (self.pfad, self.journal_pfad)
+
+    def _dateisignatur(self, pfade=None):
+        signatur = []
+        for pfad in pfade or (*self._datendateien(), self.kalender_pfad):
+            try:
+                st = os.stat(pfad)
+                signatur.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signatur.append(None)
+        return tuple(signatur)
+
+    def _geaendert(self):
+        self.generation += 1
+        self._signatur = self._dateisignatur()
+
+    def neu_laden_falls_geaendert(self):
+        # Nur drei stat()-Aufrufe; neu geparst wird erst, wenn ein anderer Prozess geschrieben hat
+        with self.sperre:
+            if self._dateisignatur() == self._signatur:
+                return False
+            self._lade_oder_erzeuge_csv()
+            return True
+
+    def _laden(self):
+        self.ladefehler = None
+        self.aus_cache = False
+        if not os.path.exists(self.pfad):
+            self.df = pd.DataFrame(columns=SPALTEN)
+            self._index = {}
+            if self.faecher is None and not self.nur_lesen:
+                self.speichern()
+            return
+        von = self._von()
+        self._filter = _filter_fuer(von, self.faecher)
+        if self._aus_cache_laden(von):
+            self.aus_cache = True
+            return
         try:
-            self.df = pd.read_csv(self.pfad)
-            self.df["Datum"] = pd.to_datetime(self.df["Datum"], errors="coerce")
-            self.df = self.df.dropna(subset=["Datum"])
+            self.df, info = speicherformat.lesen(self.pfad, self._quarantaene(), chunk_filter=self._filter)
+            self.df = self.df.reset_index(drop=True)
             self.df["Notiz"] = self.df.get("Notiz", "").fillna("")
             self.df["Tagesziel"] = self.df.get("Tagesziel", "")
-            sechs_monate_zurueck = datetime.today() - timedelta(days=180)
-            self.df = self.df[self.df["Datum"] >= sechs_monate_zurueck]
-        except Exception:
-            self.df = pd.DataFrame(columns=["ID","Fach","Dauer (Minuten)","Datum","Notiz","Tagesziel"])
-        self.speichern()
+            self._index_aufbauen()
+            journal_vorhanden = os.path.exists(self.journal_pfad)
+            self._journal_anwenden()
+        except Exception as e:
+            # Nie mit einem leeren Frame überschreiben: Datei bleibt unangetastet, Schreiben wird gesperrt
+            self.df = pd.DataFrame(columns=SPALTEN)
+            self._index = {}
+            self.ladefehler = f"{type(e).__name__}: {e}"
+            return
+        self.integritaet = info
+        if self.faecher is not None or self.nur_lesen:
+            return
+        if info["version"] < speicherformat.VERSION:
+            # Alte CSV ohne Kopf/Prüfsummen: Original sichern, dann ins neue Format migrieren
+            shutil.copy2(self.pfad, f"{self.pfad}.v{info['version']}.bak")
+            self.speichern()
+        elif journal_vorhanden or info["defekt"]:
+            self.speichern()
+
+    def _quarantaene(self):
+        # Defekte Blöcke nur sichern, wenn diese Instanz die Datei danach auch neu schreibt –
+        # sonst hängt jeder Neuladen (z. B. der API) dieselben Blöcke erneut an
+        return self.quarantaene_pfad if self.faecher is None and not self.nur_lesen else None
+
+    def _index_aufbauen(self):
+        self._index = dict(zip(self.df["ID"].astype(str).tolist(), self.df.index.tolist()))
+
+    def _journal_anwenden(self):
+        if not os.path.exists(self.journal_pfad):
+            return
+        journal, _ = speicherformat.lesen(self.journal_pfad, self._quarantaene(), dtype=dict.fromkeys(speicherformat.TEXT_SPALTEN, str))
+        journal["Datum"] = pd.to_datetime(journal["Datum"], format="ISO8601", errors="coerce")
+        journal["Notiz"] = journal["Notiz"].fillna("")
+        # Zeilen, die das Journal in den Ladefilter hinein- oder herausbewegt, berücksichtigen
+        passt = journal.index.isin(self._filter(journal.copy()).index)
+        # Änderungen nach einem Löschen zählen erst wieder ab "wiederherstellen"
+        status = journal["Aktion"].map({"loeschen": True, "wiederherstellen": False})
+        geloescht = status.groupby(journal["ID"]).ffill().eq(True) & journal["Aktion"].eq("aendern")
+        # Jede Zeile trägt den vollständigen Stand, also gewinnt je ID der letzte Eintrag
+        letzte = journal[~geloescht].drop_duplicates("ID", keep="last")
+        passt = pd.Series(passt, index=journal.index)[letzte.index].to_numpy()
+        zeilen = letzte["ID"].map(self._index)
+        vorhanden = zeilen.notna().to_numpy()
+        behalten = passt & letzte["Aktion"].ne("loeschen").to_numpy()
+
+        weg = zeilen[vorhanden & ~behalten].astype("int64")
+        self.df = self.df.drop(index=weg.tolist())
+        for eintrag_id in letzte["ID"][vorhanden & ~behalten]:
+            del self._index[eintrag_id]
+
+        aendern = letzte[vorhanden & behalten]
+        if len(aendern):
+            ziel = zeilen[vorhanden & behalten].astype("int64").tolist()
+            for spalte in SPALTEN[1:]:
+                self.df.loc[ziel, spalte] = aendern[spalte].to_numpy()
 
+        neu = letzte[~vorhanden & behalten].reindex(columns=self.df.columns)
+        if len(neu):
+            start = int(self.df.index.max()) + 1 if not self.df.empty else 0
+            neu.index = range(start, start + len(neu))
+            self.df = pd.concat([self.df, neu]) if not self.df.empty else neu
+            self._index.update(zip(neu["ID"].astype(str), neu.index))
+
+    def _journal_schreiben(self, aktion, zeilen_df):
+        journal = zeilen_df.reindex(columns=SPALTEN)
+        journal.insert(0, "Aktion", aktion)
+        self._schreibschutz_pruefen()
+        speicherformat.anhaengen(self.journal_pfad, journal)
+
+    def _schreibschutz_pruefen(self, trotz_ladefehler=False):
+        # Vor jeder Zustandsänderung aufrufen, nicht erst vor dem Schreiben
+        if self.nur_lesen:
+            raise RuntimeError(f"{self.pfad} ist nur zum Lesen geöffnet")
+        if self.ladefehler and not trotz_ladefehler:
+            raise RuntimeError(f"{self.pfad} konnte nicht gelesen werden, Schreiben ist gesperrt ({self.ladefehler})")
+
+    def _vor_aenderung(self, trotz_ladefehler=False):
+        # Erst auf den Stand der Dateien bringen: sonst überschreibt dieser Prozess Änderungen eines
+        # anderen oder verdeckt sie, weil die Signatur nach dem eigenen Schreiben wieder "aktuell" ist
+        if not self.nur_lesen:
+            self.neu_laden_falls_geaendert()
+        self._schreibschutz_pruefen(trotz_ladefehler)
+
+    @_gesperrt
     def speichern(self):
-        self.df.to_csv(self.pfad, index=False)
+        self._schreibschutz_pruefen()
+        if self.faecher is not None:
+            raise RuntimeError("Nur ein Fächer-Ausschnitt geladen, komplettes Neuschreiben ist nicht erlaubt")
+        speicherformat.schreiben(self.pfad, self.df.reindex(columns=SPALTEN))
+        # Vollständig geschriebene CSV enthält alle Änderungen, das Journal ist damit erledigt
+        if os.path.exists(self.journal_pfad):
+            os.remove(self.journal_pfad)
+        self._signatur = self._dateisignatur()
 
+    @_gesperrt
     def neuen_eintrag_hinzufuegen(self, eintrag_df):
-        self.df = pd.concat([self.df, eintrag_df], ignore_index=True)
+        self._vor_aenderung()
+        if self.faecher is not None and self.integritaet.get("version", speicherformat.VERSION) < speicherformat.VERSION:
+            # Migrieren darf nur eine vollständige Instanz, angehängt wird erst danach
+            raise RuntimeError(f"{self.pfad} ist noch im alten Format, Anhängen im Fächer-Ausschnitt ist nicht erlaubt")
+        eintrag_df = eintrag_df.copy()
+        eintrag_df["Datum"] = pd.to_datetime(eintrag_df["Datum"], errors="coerce")
+        self.kalender.schluessel_setzen(eintrag_df)
+        start = int(self.df.index.max()) + 1 if not self.df.empty else 0
+        eintrag_df.index = range(start, start + len(eintrag_df))
+        self.df = pd.concat([self.df, eintrag_df]) if not self.df.empty else eintrag_df
         self.df["Datum"] = pd.to_datetime(self.df["Datum"], errors="coerce")
+        self._index.update(zip(eintrag_df["ID"].astype(str), eintrag_df.index))
+        self.wuerfel.hinzufuegen(eintrag_df)
+        self.notizindex.hinzufuegen(eintrag_df)
+        speicherformat.anhaengen(self.pfad, eintrag_df.reindex(columns=SPALTEN))
+        self._geaendert()
+
+    def eintrag_holen(self, eintrag_id):
+        zeile = self._index.get(str(eintrag_id))
+        if zeile is None:
+            return None
+        return self.df.loc[zeile]
+
+    @_gesperrt
+    def eintrag_aktualisieren(self, eintrag_id, **felder):
+        self._vor_aenderung()
+        zeile = self._index.get(str(eintrag_id))
+        if zeile is None:
+            raise KeyError(eintrag_id)
+        for spalte in felder:
+            if spalte not in SPALTEN[1:]:
+                raise KeyError(spalte)
+        vorher = self.df.loc[[zeile]].copy()
+        for spalte, wert in felder.items():
+            if spalte == "Datum":
+                wert = pd.to_datetime(wert)
+            self.df.at[zeile, spalte] = wert
+        if "Datum" in felder:
+            tag = self.kalender.tage(self.df.loc[[zeile], "Datum"])
+            self.df.at[zeile, "Tag"] = tag[0]
+            self.df.at[zeile, "KW"] = self.kalender.wochen(tag)[0]
+        self.wuerfel.entfernen(vorher)
+        self.wuerfel.hinzufuegen(self.df.loc[[zeile]])
+        self.notizindex.entfernen(vorher)
+        self.notizindex.hinzufuegen(self.df.loc[[zeile]])
+        self._journal_schreiben("aendern", self.df.loc[[zeile]])
+        self._geaendert()
+
+    def eintrag_loeschen(self, eintrag_id):
+        if str(eintrag_id) not in self._index:
+            raise KeyError(eintrag_id)
+        self.eintraege_loeschen([eintrag_id])
+
+    @_gesperrt
+    def eintraege_loeschen(self, eintrag_ids):
+        self._vor_aenderung()
+        zeilen = [self._index.pop(str(i)) for i in eintrag_ids if str(i) in self._index]
+        if not zeilen:
+            return 0
+        geloescht = self.df.loc[zeilen]
+        # Gelöschte Zeilen als Segment ablegen, damit "Rückgängig" sie wieder einspielen kann
+        os.makedirs(self.archiv_pfad, exist_ok=True)
+        segment = os.path.join(self.archiv_pfad, f"loeschung_{datetime.now():%Y%m%d_%H%M%S_%f}.csv")
+        speicherformat.schreiben(segment, geloescht.reindex(columns=SPALTEN))
+        self._journal_schreiben("loeschen", geloescht)
+        self.df = self.df.drop(index=zeilen)
+        self.wuerfel.entfernen(geloescht)
+        self.notizindex.entfernen(geloescht)
+        self._rueckgaengig_merken("loeschen", segment)
+        self._geaendert()
+        return len(zeilen)
+
+    @_gesperrt
+    def kalender_setzen(self, zeitzone, tagesbeginn):
+        # Lerntag-Schlüssel aller geladenen Zeilen einmal neu berechnen, danach gruppieren die Seiten wieder darauf
+        self._vor_aenderung(trotz_ladefehler=True)
+        kalender = Kalender(zeitzone, tagesbeginn)
+        kalender.speichern(self.kalender_pfad)
+        self.kalender = kalender
+        self.kalender.schluessel_setzen(self.df)
+        self.wuerfel.neu_aufbauen(self.df)
+        self._geaendert()
+
+    @_gesperrt
+    def notizen_suchen(self, anfrage, praefix=False):
+        # Zeilen-Labels der Treffer (None bei leerer Anfrage); der Index entsteht bei der ersten Suche
+        if not anfrage or not anfrage.strip():
+            return None
+        if not self.notizindex.aufgebaut:
+            self.notizindex.neu_aufbauen(self.df)
+        return self.notizindex.suchen(anfrage, praefix)
+
+    @_gesperrt
+    def kompaktieren(self):
+        # Journal in die CSV falten, Aufbewahrungsfenster anwenden, abgelaufene Archiv-Segmente entfernen
+        if self.faecher is not None or self.nur_lesen:
+            return "übersprungen (Teilansicht)"
+        self._vor_aenderung()
         self.speichern()
+        self.cache_aktualisieren()
+        return f"{len(self.df)} Einträge, {self.archiv_bereinigen()} Segmente entfernt"
+
+    @_gesperrt
+    def rollups_neu_aufbauen(self):
+        self.wuerfel.neu_aufbauen(self.df)
+        return f"{len(self.wuerfel.cubes['Woche'])} Wochen"
+
+    # ------------- Epochen & Rückgängig -------------
+    def _epoche_lesen(self):
+        try:
+            with open(self.epoche_pfad, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"epoche": 0, "rueckgaengig": None}
+
+    def _epoche_schreiben(self, epoche):
+        tmp = self.epoche_pfad + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(epoche, f)
+        os.replace(tmp, self.epoche_pfad)
+
+    def _rueckgaengig_merken(self, art, segment, **extra):
+        epoche = self._epoche_lesen()
+        epoche["rueckgaengig"] = {"art": art, "segment": segment, "zeit": datetime.now().isoformat(), **extra}
+        self._epoche_schreiben(epoche)
+
+    @_gesperrt
+    def zuruecksetzen(self, weitere_dateien=()):
+        # Auch bei Ladefehler erlaubt: die unlesbare Datei wandert ins Archiv
+        self._schreibschutz_pruefen(trotz_ladefehler=True)
+        if self.faecher is not None:
+            raise RuntimeError("Nur ein Fächer-Ausschnitt geladen, Zurücksetzen ist nicht erlaubt")
+        epoche = self._epoche_lesen()
+        segment = os.path.join(self.archiv_pfad, f"epoche_{epoche['epoche']}_{datetime.now():%Y%m%d_%H%M%S_%f}")
+        os.makedirs(segment, exist_ok=True)
+        # Nur umbenennen: unabhängig von der Datenmenge O(1)
+        verschoben = {}
+        for pfad in [self.pfad, self.journal_pfad, *weitere_dateien]:
+            if os.path.exists(pfad):
+                ziel = os.path.join(segment, os.path.basename(pfad))
+                os.replace(pfad, ziel)
+                verschoben[ziel] = pfad
+        epoche["epoche"] += 1
+        epoche["rueckgaengig"] = {"art": "reset", "segment": segment, "zeit": datetime.now().isoformat(),
+                                  "dateien": verschoben}
+        self._epoche_schreiben(epoche)
+        self.df = self.kalender.schluessel_setzen(pd.DataFrame(columns=SPALTEN))
+        self._index = {}
+        self.wuerfel.neu_aufbauen(self.df)
+        self.notizindex.zuruecksetzen()
+        # Eine unlesbare Datei liegt jetzt im Archiv, der neue Bestand ist wieder beschreibbar
+        self.ladefehler = None
+        self.speichern()
+        self._geaendert()
+
+    def rueckgaengig_moeglich(self):
+        info = self._epoche_lesen().get("rueckgaengig")
+        if not info or datetime.now() - datetime.fromisoformat(info["zeit"]) > RUECKGAENGIG_FENSTER:
+            return None
+        return info
+
+    @_gesperrt
+    def rueckgaengig(self):
+        info = self.rueckgaengig_moeglich()
+        if info is None:
+            return False
+        self._vor_aenderung(trotz_ladefehler=info["art"] == "reset")
+        if self.faecher is not None:
+            raise RuntimeError("Nur ein Fächer-Ausschnitt geladen, Rückgängig ist nicht erlaubt")
+        epoche = self._epoche_lesen()
+        if info["art"] == "reset":
+            # Seit dem Reset erfasste Einträge bleiben erhalten und werden hinten angehängt
+            neue = self.df.reindex(columns=SPALTEN)
+            alt = next((ziel for ziel, pfad in info["dateien"].items() if pfad == self.pfad), None)
+            if not neue.empty and alt is not None and not speicherformat.ist_v2(alt):
+                # An eine alte oder unlesbare Datei wird nicht blind angehängt; nichts wurde verschoben
+                raise RuntimeError("Der archivierte Bestand ist nicht im aktuellen Format, seit dem Reset "
+                                   "erfasste Einträge können nicht angehängt werden")
+            for ziel, pfad in info["dateien"].items():
+                os.replace(ziel, pfad)
+            if not neue.empty and alt is not None:
+                speicherformat.anhaengen(self.pfad, neue)
+            os.rmdir(info["segment"])
+            epoche["epoche"] = max(0, epoche["epoche"] - 1)
+        else:
+            zeilen, _ = speicherformat.lesen(info["segment"], dtype=dict.fromkeys(speicherformat.TEXT_SPALTEN, str))
+            self._journal_schreiben("wiederherstellen", zeilen)
+            os.remove(info["segment"])
+        epoche["rueckgaengig"] = None
+        self._epoche_schreiben(epoche)
+        self._lade_oder_erzeuge_csv()
+        return True
+
+    def archiv_bereinigen(self):
+        # Segmente außerhalb des Rückgängig-Fensters endgültig entfernen
+        if not os.path.isdir(self.archiv_pfad):
+            return 0
+        aktiv = (self.rueckgaengig_moeglich() or {}).get("segment")
+        grenze = datetime.now() - RUECKGAENGIG_FENSTER
+        entfernt = 0
+        for name in os.listdir(self.archiv_pfad):
+            pfad = os.path.join(self.archiv_pfad, name)
+            if pfad == aktiv or datetime.fromtimestamp(os.path.getmtime(pfad)) > grenze:
+                continue
+            if os.path.isdir(pfad):
+                for datei in os.listdir(pfad):
+                    os.remove(os.path.join(pfad, datei))
+                os.rmdir(pfad)
+            else:
+                os.remove(pfad)
+            entfernt += 1
+        return entfernt
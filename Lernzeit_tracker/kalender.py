@@ -0,0 +1,98 @@
+# kalender.py
+# Lerntage statt Kalendertage: Zeitzone und Tagesbeginn sind einstellbar, z. B. zählt bei
+# Tagesbeginn 4 Uhr eine Sitzung um 1 Uhr noch zum Vortag. Jede Zeile bekommt beim Laden bzw.
+# Schreiben einmalig zwei Schlüssel, nach denen alle Seiten gruppieren und filtern:
+#
+#   Tag   Lerntag als ganze Tage seit 1970-01-01
+#   KW    ISO-Jahr * 100 + ISO-Woche des Lerntags, z. B. 202643
+#
+# Zeitstempel sind Ortszeit ohne Zonenangabe. Reine Datumsangaben (00:00:00, so speichert die
+# Eingabemaske) gehören immer zu ihrem Datum und werden nicht um den Tagesbeginn verschoben.
+import json
+import os
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+import pandas as pd
+
+STANDARD_ZEITZONE = "Europe/Berlin"
+EPOCHE = date(1970, 1, 1)
+# Schlüssel für Zeilen ohne gültiges Datum; liegt vor jedem echten Tag
+KEIN_TAG = np.iinfo(np.int32).min
+NS_PRO_TAG = 86_400 * 10**9
+
+
+class Kalender:
+    def __init__(self, zeitzone=STANDARD_ZEITZONE, tagesbeginn=0):
+        if not 0 <= int(tagesbeginn) < 24:
+            raise ValueError("tagesbeginn muss zwischen 0 und 23 Uhr liegen")
+        try:
+            self._tz = ZoneInfo(zeitzone)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unbekannte Zeitzone: {zeitzone}")
+        self.zeitzone = zeitzone
+        self.tagesbeginn = int(tagesbeginn)
+
+    @classmethod
+    def laden(cls, pfad):
+        try:
+            with open(pfad, "r", encoding="utf-8") as f:
+                return cls(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return cls()
+
+    def speichern(self, pfad):
+        tmp = pfad + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"zeitzone": self.zeitzone, "tagesbeginn": self.tagesbeginn}, f)
+        os.replace(tmp, pfad)
+
+    # ------------- Jetzt & Heute -------------
+    def jetzt(self):
+        return datetime.now(self._tz).replace(tzinfo=None)
+
+    def heute(self):
+        return (self.jetzt() - timedelta(hours=self.tagesbeginn)).date()
+
+    def zeitpunkt(self, lerntag):
+        # Zeitstempel für einen neuen Eintrag: heute mit Uhrzeit, andere Tage als reines Datum
+        if lerntag == self.heute():
+            return self.jetzt().replace(microsecond=0)
+        return datetime.combine(lerntag, datetime.min.time())
+
+    # ------------- Schlüssel -------------
+    @staticmethod
+    def tag(datum):
+        return (datum - EPOCHE).days
+
+    @staticmethod
+    def datum(tag):
+        return EPOCHE + timedelta(days=int(tag))
+
+    def tage(self, werte):
+        ns = pd.to_datetime(pd.Series(werte), errors="coerce").to_numpy("datetime64[ns]").view("i8")
+        fehlt = ns == np.iinfo(np.int64).min
+        nur_datum = ns % NS_PRO_TAG == 0
+        verschoben = np.where(nur_datum, ns, ns - self.tagesbeginn * 3600 * 10**9)
+        tage = np.floor_divide(verschoben, NS_PRO_TAG)
+        return np.where(fehlt, KEIN_TAG, tage).astype("int32")
+
+    @staticmethod
+    def wochen(tage):
+        # ISO-Woche: maßgeblich ist das Jahr des Donnerstags derselben Woche (1970-01-01 war ein Donnerstag)
+        tage = np.asarray(tage, dtype="int64")
+        donnerstag = tage - (tage + 3) % 7 + 3
+        jahr = donnerstag.astype("datetime64[D]").astype("datetime64[Y]")
+        woche = (donnerstag - jahr.astype("datetime64[D]").astype("int64")) // 7 + 1
+        kw = (jahr.astype("int64") + 1970) * 100 + woche
+        return np.where(tage == KEIN_TAG, 0, kw).astype("int32")
+
+    def woche(self, datum):
+        return int(self.wochen([self.tag(datum)])[0])
+
+    def schluessel_setzen(self, df):
+        tage = self.tage(df["Datum"]) if len(df) else np.empty(0, dtype="int32")
+        df["Tag"] = tage
+        df["KW"] = self.wochen(tage)
+        return df
@@ -0,0 +1,73 @@
+# metriken.py
+# Serien-, Konstanz- und Prognose-Kennzahlen aus der Tagessummen-Reihe.
+# Alles in einem vektorisierten Durchlauf über ein lückenloses Tages-Array (NumPy), ohne Python-Schleifen.
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+
+def _laeufe(aktiv):
+    # Lauflängen-Kodierung: Start/Ende (exklusiv) jeder Folge aktiver Tage
+    rand = np.diff(np.concatenate(([0], aktiv.astype(np.int8), [0])))
+    return np.flatnonzero(rand == 1), np.flatnonzero(rand == -1)
+
+
+def _gleitender_schnitt(minuten, fenster):
+    summe = np.concatenate(([0.0], np.cumsum(minuten, dtype=float)))
+    ende = np.arange(1, len(minuten) + 1)
+    return (summe[ende] - summe[np.maximum(ende - fenster, 0)]) / fenster
+
+
+def berechnen(tagesreihe, tagesziel, heute):
+    # tagesreihe: Minuten je Lerntag (Index = date), tagesziel: Minuten pro Tag, heute: aktueller Lerntag
+    leer = {
+        "aktuelle_serie": 0, "laengste_serie": 0, "schnitt_7": 0.0, "schnitt_30": 0.0,
+        "woche_bisher": 0, "woche_prognose": 0.0, "wochenziel": tagesziel * 7, "prognose_anteil": 0.0,
+        "verlauf": pd.DataFrame(columns=["Minuten", "Ø 7 Tage", "Ø 30 Tage"]),
+        "aktive_tage_pro_woche": pd.Series(dtype="int64"),
+    }
+    if tagesreihe.empty:
+        return leer
+
+    # Lückenloses Tages-Array vom ersten Montag bis heute
+    erster = min(tagesreihe.index.min(), heute)
+    start = erster - timedelta(days=erster.weekday())
+    tage = pd.date_range(start, heute, freq="D")
+    minuten = tagesreihe.set_axis(pd.to_datetime(tagesreihe.index)).reindex(tage, fill_value=0) \
+                        .to_numpy(dtype=float)
+    aktiv = minuten > 0
+
+    anfang, ende = _laeufe(aktiv)
+    laengen = ende - anfang
+    laengste = int(laengen.max()) if len(laengen) else 0
+    # Eine Serie gilt als laufend, wenn sie heute oder gestern endet (heute noch nichts eingetragen)
+    aktuelle = int(laengen[-1]) if len(ende) and ende[-1] >= len(minuten) - 1 else 0
+
+    schnitt_7 = _gleitender_schnitt(minuten, 7)
+    schnitt_30 = _gleitender_schnitt(minuten, 30)
+
+    # Aktive Tage je Kalenderwoche: Array auf volle Wochen auffüllen und als (Wochen × 7) summieren
+    rest = (-len(aktiv)) % 7
+    wochen = np.concatenate((aktiv, np.zeros(rest, dtype=bool))).reshape(-1, 7)
+    aktive_tage = pd.Series(wochen.sum(axis=1), index=tage[::7], name="Aktive Tage")
+
+    # Lineare Hochrechnung der laufenden Woche aus dem bisherigen Tempo
+    vergangen = heute.weekday() + 1
+    woche_bisher = float(minuten[-vergangen:].sum())
+    prognose = woche_bisher / vergangen * 7
+    wochenziel = tagesziel * 7
+
+    verlauf = pd.DataFrame({"Minuten": minuten, "Ø 7 Tage": schnitt_7, "Ø 30 Tage": schnitt_30}, index=tage)
+    return {
+        "aktuelle_serie": aktuelle,
+        "laengste_serie": laengste,
+        "schnitt_7": float(schnitt_7[-1]),
+        "schnitt_30": float(schnitt_30[-1]),
+        "woche_bisher": int(woche_bisher),
+        "woche_prognose": float(prognose),
+        "wochenziel": wochenziel,
+        "prognose_anteil": float(prognose / wochenziel) if wochenziel else 0.0,
+        "verlauf": verlauf.loc[verlauf.index >= pd.Timestamp(tagesreihe.index.min())],
+        "aktive_tage_pro_woche": aktive_tage,
+    }
@@ -0,0 +1,124 @@
+# notizsuche.py
+# Invertierter Index über die Notiz-Spalte: Token -> Zeilen-Labels des DataFrames.
+# Wird beim ersten Suchen aufgebaut und danach bei jedem Einfügen/Ändern/Löschen
+# nur um die betroffenen Zeilen korrigiert – eine Suche kostet dann Set-Schnitte statt str.contains.
+import re
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+UMLAUTE = [("ä", "ae"), ("ö", "oe"), ("ü", "ue"), ("ß", "ss")]
+TOKEN = re.compile(r"\w+")
+# Kombinierende diakritische Zeichen, die nach NFKD übrig bleiben (é -> e + ◌́)
+AKZENTE = re.compile("[\u0300-\u036f]")
+
+
+def normalisieren(text):
+    # "Übung" -> "uebung", "Café" -> "cafe"
+    text = str(text).casefold()
+    for umlaut, ersatz in UMLAUTE:
+        text = text.replace(umlaut, ersatz)
+    if text.isascii():
+        return text
+    return AKZENTE.sub("", unicodedata.normalize("NFKD", text))
+
+
+def _alle_normalisieren(notizen):
+    # Wie normalisieren(), aber vektorisiert über alle verschiedenen Notizen auf einmal
+    texte = pd.Series(notizen).astype(str).str.casefold()
+    for umlaut, ersatz in UMLAUTE:
+        texte = texte.str.replace(umlaut, ersatz, regex=False)
+    return texte.str.normalize("NFKD").str.replace(AKZENTE.pattern, "", regex=True).tolist()
+
+
+def tokens(text):
+    if text is None or text != text:
+        return set()
+    return set(TOKEN.findall(normalisieren(text)))
+
+
+def _gruppen(df):
+    # Gleiche Notizen nur einmal zerlegen: (Tokens, Zeilen-Labels) je verschiedener Notiz
+    codes, notizen = pd.factorize(df["Notiz"])
+    if not len(notizen):
+        return
+    reihenfolge = np.argsort(codes, kind="stable")
+    sortiert = codes[reihenfolge]
+    grenzen = np.flatnonzero(np.diff(sortiert)) + 1
+    anfaenge = [0, *grenzen.tolist()]
+    enden = [*grenzen.tolist(), len(sortiert)]
+    labels = df.index.to_numpy()[reihenfolge].tolist()
+    texte = _alle_normalisieren(notizen)
+    for anfang, ende, code in zip(anfaenge, enden, sortiert[anfaenge].tolist()):
+        if code >= 0:
+            yield set(TOKEN.findall(texte[code])), labels[anfang:ende]
+
+
+class NotizIndex:
+    def __init__(self):
+        self.zuruecksetzen()
+
+    def zuruecksetzen(self):
+        # Ungültig machen; neu aufgebaut wird erst bei der nächsten Suche
+        self.aufgebaut = False
+        self._postings = {}
+        self._sortiert = []
+        self._sortiert_aktuell = True
+
+    def neu_aufbauen(self, df):
+        self.zuruecksetzen()
+        self.aufgebaut = True
+        self._hinzufuegen(df)
+
+    def _hinzufuegen(self, df):
+        for woerter, zeilen in _gruppen(df):
+            for wort in woerter:
+                treffer = self._postings.get(wort)
+                if treffer is None:
+                    self._postings[wort] = treffer = set()
+                    self._sortiert_aktuell = False
+                treffer.update(zeilen)
+
+    def hinzufuegen(self, df):
+        if self.aufgebaut:
+            self._hinzufuegen(df)
+
+    def entfernen(self, df):
+        # df enthält die Zeilen mit ihren bisherigen Notizen
+        if not self.aufgebaut:
+            return
+        for woerter, zeilen in _gruppen(df):
+            for wort in woerter:
+                treffer = self._postings.get(wort)
+                if treffer is None:
+                    continue
+                treffer.difference_update(zeilen)
+                if not treffer:
+                    del self._postings[wort]
+                    self._sortiert_aktuell = False
+
+    def _mit_praefix(self, praefix):
+        if not self._sortiert_aktuell:
+            self._sortiert = sorted(self._postings)
+            self._sortiert_aktuell = True
+        treffer = set()
+        i = bisect_left(self._sortiert, praefix)
+        while i < len(self._sortiert) and self._sortiert[i].startswith(praefix):
+            treffer |= self._postings[self._sortiert[i]]
+            i += 1
+        return treffer
+
+    def suchen(self, anfrage, praefix=False):
+        # Alle Wörter der Anfrage müssen vorkommen (UND); mit praefix=True genügt der Wortanfang
+        woerter = tokens(anfrage)
+        if not woerter:
+            return None
+        treffer = [self._mit_praefix(w) if praefix else self._postings.get(w, set()) for w in woerter]
+        # Mit der kleinsten Trefferliste beginnen, dann schneiden
+        treffer.sort(key=len)
+        ergebnis = set(treffer[0])
+        for t in treffer[1:]:
+            ergebnis &= t
+        return ergebnis
@@ -0,0 +1,142 @@
+# spalten_cache.py
+# Binärer Spalten-Cache neben der CSV (daten.csv.spalten/), damit ein Neustart nicht parsen muss:
+#
+#   datum.i8    int64  Nanosekunden seit 1970      -> per numpy.memmap, ohne Kopie
+#   dauer.i8    Minuten (int64, bei Kommazahlen dauer.f8) -> per numpy.memmap, ohne Kopie
+#   fach.i4     int32  Code in meta["faecher"]      -> per numpy.memmap
+#   ziel.i4     int32  Code in meta["tagesziele"]   -> per numpy.memmap
+#   id.txt / notiz.txt   UTF-8, Werte durch \0 getrennt (String-Tabelle)
+#   meta.json   Zeilenzahl, Code-Tabellen und Signatur der Quelldateien
+#
+# Die Zeilen sind stabil nach Datum sortiert abgelegt; das Zeitfenster ist beim Laden
+# damit ein Slice (searchsorted) und bleibt ebenfalls ohne Kopie.
+#
+# Passt die Signatur (mtime/Größe von CSV und Journal) nicht mehr, gilt der Cache als veraltet.
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+VERSION = 1
+TRENNER = "\0"
+NUMERISCH = {"datum": "i8", "fach": "i4", "ziel": "i4"}
+
+
+def _meta_lesen(verzeichnis):
+    try:
+        with open(os.path.join(verzeichnis, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _ersetzen(verzeichnis, name, schreiben):
+    # Jede Datei atomar ersetzen: bereits gemappte alte Dateien bleiben gültig
+    pfad = os.path.join(verzeichnis, name)
+    tmp = pfad + ".tmp"
+    with open(tmp, "wb") as f:
+        schreiben(f)
+    os.replace(tmp, pfad)
+
+
+def _codes(werte):
+    codes, tabelle = pd.factorize(werte, use_na_sentinel=True)
+    # numpy-Skalare in Python-Werte umwandeln, damit sie JSON-fähig sind
+    return codes.astype("int32"), [w.item() if hasattr(w, "item") else w for w in tabelle]
+
+
+def _text(werte):
+    return TRENNER.join(
+        "" if pd.isna(w) else str(w).replace(TRENNER, "") for w in werte
+    ).encode("utf-8")
+
+
+def ist_aktuell(verzeichnis, signatur, von=None):
+    meta = _meta_lesen(verzeichnis)
+    if not meta or meta.get("version") != VERSION or meta.get("signatur") != json.loads(json.dumps(signatur)):
+        return None
+    # Der Cache darf mehr Zeilen enthalten als angefragt (älteres Fenster), aber nicht weniger
+    if meta["von"] is not None and (von is None or pd.Timestamp(meta["von"]) > von):
+        return None
+    return meta
+
+
+def schreiben(verzeichnis, df, signatur, von=None):
+    os.makedirs(verzeichnis, exist_ok=True)
+    meta_pfad = os.path.join(verzeichnis, "meta.json")
+    if os.path.exists(meta_pfad):
+        os.remove(meta_pfad)
+    datum = pd.to_datetime(df["Datum"]).to_numpy("datetime64[ns]").view("i8")
+    df = df.iloc[np.argsort(datum, kind="stable")]
+    dauer = pd.to_numeric(df["Dauer (Minuten)"], errors="coerce")
+    dauer_typ = "i8" if pd.api.types.is_integer_dtype(dauer) else "f8"
+    fach, faecher = _codes(df["Fach"])
+    ziel, tagesziele = _codes(df["Tagesziel"])
+    spalten = {
+        f"datum.{NUMERISCH['datum']}": (np.sort(datum, kind="stable"), NUMERISCH["datum"]),
+        f"dauer.{dauer_typ}": (dauer.to_numpy(dauer_typ), dauer_typ),
+        f"fach.{NUMERISCH['fach']}": (fach, NUMERISCH["fach"]),
+        f"ziel.{NUMERISCH['ziel']}": (ziel, NUMERISCH["ziel"]),
+    }
+    for name, (werte, typ) in spalten.items():
+        _ersetzen(verzeichnis, name, lambda f, w=werte, t=typ: f.write(np.ascontiguousarray(w, dtype=t).tobytes()))
+    _ersetzen(verzeichnis, "id.txt", lambda f: f.write(_text(df["ID"])))
+    _ersetzen(verzeichnis, "notiz.txt", lambda f: f.write(_text(df["Notiz"])))
+    meta = {
+        "version": VERSION,
+        "zeilen": len(df),
+        "dauer_typ": dauer_typ,
+        "faecher": faecher,
+        "tagesziele": tagesziele,
+        "von": None if von is None else pd.Timestamp(von).isoformat(),
+        "signatur": signatur,
+    }
+    _ersetzen(verzeichnis, "meta.json", lambda f: f.write(json.dumps(meta).encode("utf-8")))
+
+
+def _spalte(verzeichnis, name, typ, zeilen):
+    if zeilen == 0:
+        return np.empty(0, dtype=typ)
+    # mode="c": Copy-on-Write, In-Place-Änderungen am DataFrame berühren die Datei nicht
+    return np.memmap(os.path.join(verzeichnis, f"{name}.{typ}"), dtype=typ, mode="c", shape=(zeilen,))
+
+
+def _texte(verzeichnis, name, zeilen):
+    if zeilen == 0:
+        return []
+    with open(os.path.join(verzeichnis, name), "rb") as f:
+        return f.read().decode("utf-8").split(TRENNER)
+
+
+def laden(verzeichnis, signatur, von=None):
+    # Gibt den DataFrame zurück oder None, wenn der Cache fehlt/veraltet ist
+    meta = ist_aktuell(verzeichnis, signatur, von)
+    if meta is None:
+        return None
+    try:
+        n = meta["zeilen"]
+        datum = _spalte(verzeichnis, "datum", NUMERISCH["datum"], n).view("datetime64[ns]")
+        # Nur die Zeilen ab "von" übernehmen: Slice auf die sortierte Datumsspalte
+        start = int(np.searchsorted(datum, np.datetime64(von, "ns"))) if von is not None else 0
+        fach = _spalte(verzeichnis, "fach", NUMERISCH["fach"], n)[start:]
+        ziel = _spalte(verzeichnis, "ziel", NUMERISCH["ziel"], n)[start:]
+        df = pd.DataFrame({
+            "ID": _texte(verzeichnis, "id.txt", n)[start:],
+            "Fach": _aus_codes(fach, meta["faecher"]),
+            "Dauer (Minuten)": _spalte(verzeichnis, "dauer", meta["dauer_typ"], n)[start:],
+            "Datum": datum[start:],
+            "Notiz": _texte(verzeichnis, "notiz.txt", n)[start:],
+            "Tagesziel": _aus_codes(ziel, meta["tagesziele"]),
+        }, copy=False)
+    except (OSError, ValueError, IndexError, KeyError):
+        return None
+    if len(df) != n - start:
+        return None
+    return df
+
+
+def _aus_codes(codes, tabelle):
+    # Code -1 steht für fehlende Werte
+    werte = np.array(tabelle + [None], dtype=object)
+    return werte[codes]
@@ -0,0 +1,194 @@
+# speicherformat.py
+# CSV mit Versionskopf und Blöcken, die jeweils eine CRC32-Prüfsumme tragen:
+#
+#   #LERNZEIT;version=2
+#   ID,Fach,...                      <- normale CSV-Kopfzeile
+#   #BLOCK;bytes=1234;crc32=89abcdef
+#   ...1234 Bytes CSV-Zeilen...
+#   #BLOCK;bytes=...
+#
+# Defekte Blöcke werden beim Lesen übersprungen und in eine Quarantäne-Datei kopiert.
+import os
+import re
+import zlib
+from io import BytesIO
+import pandas as pd
+
+try:
+    from pyarrow import ArrowInvalid, csv as pa_csv
+except ImportError:  # pyarrow ist optional, sonst parst die C-Engine von pandas
+    pa_csv = None
+    ArrowInvalid = ()
+
+VERSION = 2
+KOPF = f"#LERNZEIT;version={VERSION}\n".encode()
+BLOCK_PRAEFIX = b"#BLOCK;"
+BLOCK_MUSTER = re.compile(rb"^#BLOCK;bytes=(\d+);crc32=([0-9a-f]{8})\r?\n$")
+BLOCK_ZEILEN = 1000
+# Mehrere Blöcke werden gemeinsam geparst, damit read_csv nicht pro Block aufgerufen wird
+STAPEL_BYTES = 4 * 1024 * 1024
+CHUNK_ZEILEN = 200_000
+# Feste Typen für Textspalten: open_csv legt die Typen sonst anhand des ersten Blocks fest, und eine dort
+# durchgehend leere Notiz scheitert am ersten Wert weiter hinten
+TEXT_SPALTEN = ["ID", "Fach", "Datum", "Notiz", "Tagesziel"]
+
+
+def _block_bytes(df):
+    daten = df.to_csv(index=False, header=False).encode("utf-8")
+    return f"#BLOCK;bytes={len(daten)};crc32={zlib.crc32(daten):08x}\n".encode() + daten
+
+
+def _bloecke(df):
+    for start in range(0, len(df), BLOCK_ZEILEN):
+        yield _block_bytes(df.iloc[start:start + BLOCK_ZEILEN])
+
+
+def ist_v2(pfad):
+    try:
+        with open(pfad, "rb") as f:
+            return f.readline() == KOPF
+    except OSError:
+        return False
+
+
+def schreiben(pfad, df):
+    # Erst vollständig in eine temporäre Datei, dann atomar ersetzen
+    tmp = pfad + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(KOPF)
+        f.write(df.head(0).to_csv(index=False).encode("utf-8"))
+        for block in _bloecke(df):
+            f.write(block)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, pfad)
+
+
+def anhaengen(pfad, df):
+    # Nur eine fehlende (oder leere) Datei wird angelegt; alte bzw. unlesbare Dateien muss der Aufrufer erst migrieren
+    if not os.path.exists(pfad) or os.path.getsize(pfad) == 0:
+        return schreiben(pfad, df)
+    if not ist_v2(pfad):
+        raise ValueError(f"{pfad} ist nicht im Format Version {VERSION}, Anhängen verweigert")
+    with open(pfad, "ab") as f:
+        for block in _bloecke(df):
+            f.write(block)
+
+
+def _bloecke_streamen(f):
+    # Liest Block für Block aus der offenen Datei; der Speicherbedarf hängt nur von der Blockgröße ab
+    kaputt = []
+    while True:
+        zeile = f.readline()
+        if not zeile:
+            break
+        treffer = BLOCK_MUSTER.match(zeile)
+        if treffer:
+            nach_kopf = f.tell()
+            laenge = int(treffer.group(1))
+            daten = f.read(laenge)
+            if len(daten) == laenge and f"{zlib.crc32(daten):08x}".encode() == treffer.group(2):
+                if kaputt:
+                    yield b"".join(kaputt), False
+                    kaputt = []
+                yield daten, True
+                continue
+            # Prüfsumme falsch oder Datei abgeschnitten: zeilenweise bis zum nächsten gültigen Blockkopf
+            f.seek(nach_kopf)
+        kaputt.append(zeile)
+    if kaputt:
+        yield b"".join(kaputt), False
+
+
+def bloecke_lesen(pfad):
+    # Liefert (Kopfzeile, Generator über (Block-Bytes, ok)) ohne die CSV zu parsen
+    f = open(pfad, "rb")
+    f.readline()
+    kopfzeile = f.readline()
+
+    def bloecke():
+        with f:
+            yield from _bloecke_streamen(f)
+    return kopfzeile, bloecke()
+
+
+def pruefen(pfad):
+    if not ist_v2(pfad):
+        return {"version": 1, "bloecke": 0, "defekt": 0}
+    _, bloecke = bloecke_lesen(pfad)
+    gesamt = defekt = 0
+    for _, ok in bloecke:
+        gesamt += 1
+        defekt += not ok
+    return {"version": VERSION, "bloecke": gesamt, "defekt": defekt}
+
+
+def _quarantaene(pfad, daten):
+    with open(pfad, "ab") as f:
+        f.write(f"#QUARANTAENE;bytes={len(daten)}\n".encode())
+        f.write(daten)
+        if not daten.endswith(b"\n"):
+            f.write(b"\n")
+
+
+def _pa_optionen():
+    return dict(
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True, invalid_row_handler=lambda _: "skip"),
+        convert_options=pa_csv.ConvertOptions(column_types={spalte: "string" for spalte in TEXT_SPALTEN}),
+    )
+
+
+def _stapel_parsen(kopfzeile, stapel, chunk_filter, read_csv_args):
+    inhalt = BytesIO(kopfzeile + b"".join(stapel))
+    if pa_csv is not None and not read_csv_args:
+        df = pa_csv.read_csv(inhalt, **_pa_optionen()).to_pandas()
+    else:
+        df = pd.read_csv(inhalt, **read_csv_args)
+    return chunk_filter(df) if chunk_filter else df
+
+
+def _alt_lesen(pfad, chunk_filter, read_csv_args):
+    # Alte CSV ohne Blöcke: gestückelt lesen, mit pyarrow falls installiert
+    teile = None
+    if pa_csv is not None and not read_csv_args:
+        try:
+            leser = pa_csv.open_csv(pfad, read_options=pa_csv.ReadOptions(block_size=STAPEL_BYTES), **_pa_optionen())
+            teile = [chunk_filter(b.to_pandas()) if chunk_filter else b.to_pandas() for b in leser]
+        except ArrowInvalid:
+            # Ein späterer Block passt nicht zu den Typen des ersten (z. B. Dauer mit Nachkommastellen)
+            teile = None
+    if teile is None:
+        teile = [
+            chunk_filter(chunk) if chunk_filter else chunk
+            for chunk in pd.read_csv(pfad, on_bad_lines="skip", chunksize=CHUNK_ZEILEN,
+                                     **{"dtype": dict.fromkeys(TEXT_SPALTEN, str), **read_csv_args})
+        ]
+    if not teile:
+        return pd.read_csv(pfad, nrows=0, **read_csv_args)
+    return pd.concat(teile, ignore_index=True)
+
+
+def lesen(pfad, quarantaene_pfad=None, chunk_filter=None, **read_csv_args):
+    # Gibt (DataFrame, Info) zurück; alte CSVs ohne Kopf werden als Version 1 gelesen.
+    # chunk_filter wird auf jedes Teilstück angewendet, bevor es behalten wird.
+    if not ist_v2(pfad):
+        return _alt_lesen(pfad, chunk_filter, read_csv_args), {"version": 1, "bloecke": 0, "defekt": 0}
+    kopfzeile, bloecke = bloecke_lesen(pfad)
+    teile, stapel, stapel_bytes = [], [], 0
+    gesamt = defekt = 0
+    for daten, ok in bloecke:
+        gesamt += 1
+        if not ok:
+            defekt += 1
+            if quarantaene_pfad:
+                _quarantaene(quarantaene_pfad, daten)
+            continue
+        stapel.append(daten)
+        stapel_bytes += len(daten)
+        if stapel_bytes >= STAPEL_BYTES:
+            teile.append(_stapel_parsen(kopfzeile, stapel, chunk_filter, read_csv_args))
+            stapel, stapel_bytes = [], 0
+    if stapel or not teile:
+        teile.append(_stapel_parsen(kopfzeile, stapel, chunk_filter, read_csv_args))
+    df = pd.concat(teile, ignore_index=True) if len(teile) > 1 else teile[0]
+    return df, {"version": VERSION, "bloecke": gesamt, "defekt": defekt}
@@ -2,12 +2,18 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from datetime import datetime, date, timedelta
+from zoneinfo import available_timezones
 import uuid
 
 from data_manager import LernzeitDaten
 from ziel_manager import ZielVerwaltung
 from export_manager import ExportManager
+from bericht_manager import BerichtJob
+from zeitplaner import standard_zeitplaner
+from kalender import Kalender
+import speicherformat
+import auswertung
+import metriken
 
 # ------------- App-Setup -------------
 st.set_page_config(page_title="Lernzeit-Tracker", page_icon="📚", layout="wide")
@@ -15,14 +21,18 @@ st.set_page_config(page_title="Lernzeit-Tracker", page_icon="📚", layout="wide
 PAGES = {
     "📊 Übersicht": "overview",
     "➕ Eintrag hinzufügen": "add",
+    "✏️ Einträge bearbeiten": "edit",
     "🌞 Tagesziel": "goal",
     "📅 Wochenauswertung": "weekly",
+    "📈 Fächeranalyse": "subjects",
     "🧪 Heatmap": "heatmap",
     "🔎 Filter & Export": "export",
     "📆 Zielverlauf": "targets",
     "🗑️ Datenbank löschen": "reset",
     "⚙️ Einstellungen": "settings",
 }
+# Auswahlliste beim Bearbeiten: so viele Einträge pro Seite
+EINTRAEGE_PRO_SEITE = 100
 
 # ------------- Session Defaults -------------
 if "page" not in st.session_state:
@@ -37,12 +47,36 @@ if "global_von" not in st.session_state:
     st.session_state.global_von = None
 if "global_bis" not in st.session_state:
     st.session_state.global_bis = None
+if "global_suche" not in st.session_state:
+    st.session_state.global_suche = ""
+    st.session_state.global_praefix = True
 
 # ------------- Data Layer -------------
-data = LernzeitDaten()
+@st.cache_resource
+def lade_daten():
+    # Eine Instanz pro Prozess: geparste Daten und Fach-Würfel bleiben über Reruns erhalten
+    return LernzeitDaten()
+
+data = lade_daten()
+
+@st.cache_resource
+def starte_zeitplaner(_data):
+    # Wiederkehrende Aufgaben laufen in einem Hintergrund-Thread, nicht beim Seitenaufbau
+    return standard_zeitplaner(_data).starten()
+
+zeitplaner = starte_zeitplaner(data)
+# Schreibt ein anderer Prozess (z. B. zweite Instanz), wird nur dann neu geparst
+data.neu_laden_falls_geaendert()
 ziel_mgr = ZielVerwaltung()
+# Zeitzone/Tagesbeginn: "heute" ist der aktuelle Lerntag, gruppiert wird auf den Spalten Tag/KW
+kalender = data.kalender
 df = data.df.copy()
 
+if data.ladefehler:
+    st.error(f"❌ {data.pfad} ist beschädigt und wurde nicht geladen. Die Datei bleibt unverändert, Speichern ist gesperrt. ({data.ladefehler})")
+elif data.integritaet.get("defekt"):
+    st.warning(f"⚠️ {data.integritaet['defekt']} beschädigte Blöcke wurden nach {data.quarantaene_pfad} verschoben.")
+
 
 def ensure_datetime(df, col="Datum"):
     if col in df.columns:
@@ -53,6 +87,18 @@ def ensure_datetime(df, col="Datum"):
 df = ensure_datetime(df)
 
 
+@st.cache_data(max_entries=8)
+def lade_metriken(_data, generation, tagesziel, heute):
+    # Neu berechnet wird nur, wenn sich die Daten (Generation), das Ziel oder der Tag ändern
+    with _data.sperre:
+        reihe = auswertung.tagesreihe(_data.df)
+    return metriken.berechnen(reihe, tagesziel, heute)
+
+def aktuelles_tagesziel():
+    ziele = ziel_mgr.get_df()
+    return int(ziele["Tagesziel"].iloc[0]) if not ziele.empty else 90
+
+
 def kpi(label, value, help_text=None, delta=None):
     st.metric(label, value, delta=delta, help=help_text)
 
@@ -63,24 +109,46 @@ def empty_state(text, button_label=None, on_click=None):
             if on_click:
                 on_click()
 
+def undo_hinweis():
+    info = data.rueckgaengig_moeglich()
+    if not info:
+        return
+    text = "Datenbank wurde zurückgesetzt." if info["art"] == "reset" else "Einträge wurden gelöscht."
+    col1, col2 = st.columns([3,1])
+    with col1:
+        st.info(f"ℹ️ {text} Rückgängig möglich innerhalb von 24 Stunden.")
+    with col2:
+        if st.button("↩️ Rückgängig", key="undo"):
+            try:
+                data.rueckgaengig()
+            except RuntimeError as e:
+                st.error(f"❌ Rückgängig nicht möglich: {e}")
+                return
+            st.rerun()
+
 def global_filter_ui(df):
     with st.sidebar.expander("🔎 Globaler Filter", expanded=False):
         faecher = ["Alle"] + sorted(df["Fach"].dropna().unique().tolist()) if not df.empty else ["Alle"]
         st.session_state.global_fach = st.selectbox("Fach", faecher, index=0)
         if not df.empty:
-            min_d = df["Datum"].min().date()
-            max_d = df["Datum"].max().date()
+            min_d = Kalender.datum(df["Tag"].min())
+            max_d = Kalender.datum(df["Tag"].max())
         else:
-            min_d = max_d = date.today()
+            min_d = max_d = kalender.heute()
         st.session_state.global_von = st.date_input("Von", min_d)
         st.session_state.global_bis = st.date_input("Bis", max_d)
+        st.session_state.global_suche = st.text_input("Notiz enthält", placeholder="z. B. integral übung")
+        st.session_state.global_praefix = st.checkbox("Auch Wortanfänge finden", value=True)
 
 def apply_global_filter(df):
     if df.empty:
         return df
-    mask = (df["Datum"].dt.date >= st.session_state.global_von) & (df["Datum"].dt.date <= st.session_state.global_bis)
+    mask = df["Tag"].between(Kalender.tag(st.session_state.global_von), Kalender.tag(st.session_state.global_bis))
     if st.session_state.global_fach != "Alle":
         mask &= (df["Fach"] == st.session_state.global_fach)
+    treffer = data.notizen_suchen(st.session_state.global_suche, st.session_state.global_praefix)
+    if treffer is not None:
+        mask &= df.index.isin(list(treffer))
     return df[mask]
 
 # ------------- Seiten -------------
@@ -91,34 +159,44 @@ def page_overview():
         return empty_state("Noch keine Einträge vorhanden.", "➕ Jetzt ersten Eintrag anlegen", lambda: set_page("➕ Eintrag hinzufügen"))
 
     # KPIs
-    today = date.today()
-    week_start = today - timedelta(days=today.weekday())
-    this_week = df[df["Datum"].dt.date >= week_start]
-    today_minutes = df[df["Datum"].dt.date == today]["Dauer (Minuten)"].sum()
-    week_minutes = this_week["Dauer (Minuten)"].sum()
-    total_minutes = df["Dauer (Minuten)"].sum()
+    werte = auswertung.kennzahlen(df, kalender.heute())
 
     c1, c2, c3 = st.columns(3)
-    with c1: kpi("Heute", f"{int(today_minutes)} Min")
-    with c2: kpi("Diese Woche", f"{int(week_minutes)} Min")
-    with c3: kpi("Gesamt", f"{int(total_minutes)} Min")
+    with c1: kpi("Heute", f"{werte['heute']} Min")
+    with c2: kpi("Diese Woche", f"{werte['woche']} Min")
+    with c3: kpi("Gesamt", f"{werte['gesamt']} Min")
+
+    m = lade_metriken(data, data.generation, aktuelles_tagesziel(), kalender.heute())
+    c1, c2, c3, c4 = st.columns(4)
+    with c1: kpi("Aktuelle Serie", f"{m['aktuelle_serie']} Tage", help_text=f"Längste Serie: {m['laengste_serie']} Tage")
+    with c2: kpi("Ø 7 Tage", f"{m['schnitt_7']:.0f} Min")
+    with c3: kpi("Ø 30 Tage", f"{m['schnitt_30']:.0f} Min")
+    with c4: kpi("Prognose Woche", f"{m['woche_prognose']:.0f} / {m['wochenziel']} Min",
+                 help_text="Hochrechnung des bisherigen Wochentempos auf 7 Tage",
+                 delta=f"{m['prognose_anteil'] * 100:.0f} % des Wochenziels")
 
     # Diagramme
-    tabs = st.tabs(["Nach Fach", "Über Zeit"])
+    tabs = st.tabs(["Nach Fach", "Über Zeit", "Konstanz"])
     with tabs[0]:
-        by_subject = df.groupby("Fach")["Dauer (Minuten)"].sum().sort_values(ascending=False)
+        by_subject = data.wuerfel.summe_je_fach()
         if by_subject.empty:
             st.info("Keine Daten für Fächer vorhanden.")
         else:
             st.bar_chart(by_subject)
 
     with tabs[1]:
-        per_day = df.groupby(df["Datum"].dt.date)["Dauer (Minuten)"].sum()
+        per_day = auswertung.tagesreihe(df)
         if per_day.empty:
             st.info("Keine zeitliche Verteilung vorhanden.")
         else:
             st.line_chart(per_day)
 
+    with tabs[2]:
+        st.caption("Gleitende Durchschnitte (Minuten pro Tag)")
+        st.line_chart(m["verlauf"][["Ø 7 Tage", "Ø 30 Tage"]])
+        st.caption("Aktive Tage pro Woche")
+        st.bar_chart(m["aktive_tage_pro_woche"])
+
 def page_add():
     st.subheader("➕ Eintrag hinzufügen")
 
@@ -132,7 +210,7 @@ def page_add():
     with col1:
         dauer = st.number_input("⏱️ Minuten", min_value=1, step=1, value=25)
     with col2:
-        datum = st.date_input("📅 Datum", value=date.today())
+        datum = st.date_input("📅 Datum", value=kalender.heute())
     notiz = st.text_area("📝 Notiz (optional)")
 
 
@@ -145,13 +223,63 @@ def page_add():
             st.warning("Bitte gib ein Fach ein.")
             return
         new_row = pd.DataFrame(
-            [[str(uuid.uuid4()), fach.strip(), dauer, datum, notiz, "90"]],
+            [[str(uuid.uuid4()), fach.strip(), dauer, kalender.zeitpunkt(datum), notiz, "90"]],
             columns=["ID","Fach","Dauer (Minuten)","Datum","Notiz","Tagesziel"]
         )
         data.neuen_eintrag_hinzufuegen(new_row)
         st.session_state.eintrag_gespeichert = True
         st.rerun()
 
+def page_edit():
+    st.subheader("✏️ Einträge bearbeiten")
+
+    if df.empty:
+        return empty_state("Noch keine Einträge vorhanden.", "➕ Eintrag hinzufügen", lambda: set_page("➕ Eintrag hinzufügen"))
+
+    dff = apply_global_filter(df).sort_values("Datum", ascending=False)
+    if dff.empty:
+        return empty_state("Im gewählten Zeitraum gibt es keine Einträge.")
+
+    # Nur eine Seite in die Auswahl; Filter und Notizsuche in der Seitenleiste grenzen die Liste weiter ein
+    seiten = -(-len(dff) // EINTRAEGE_PRO_SEITE)
+    seite = 1
+    if seiten > 1:
+        seite = st.number_input(f"Seite (1–{seiten}, {len(dff)} Einträge)", min_value=1, max_value=seiten, step=1, value=1)
+    dff = dff.iloc[(seite - 1) * EINTRAEGE_PRO_SEITE:seite * EINTRAEGE_PRO_SEITE]
+    labels = dict(zip(
+        dff["ID"],
+        dff["Datum"].dt.strftime("%d.%m.%Y").fillna("") + " · " + dff["Fach"].astype(str) + " · "
+        + dff["Dauer (Minuten)"].astype(int).astype(str) + " Min",
+    ))
+    eintrag_id = st.selectbox("Eintrag wählen", list(labels.keys()), format_func=labels.get)
+    eintrag = data.eintrag_holen(eintrag_id)
+
+    with st.form(f"edit_{eintrag_id}"):
+        fach = st.text_input("📘 Fach", value=eintrag["Fach"])
+        col1, col2 = st.columns([1,1])
+        with col1:
+            dauer = st.number_input("⏱️ Minuten", min_value=1, step=1, value=int(eintrag["Dauer (Minuten)"]))
+        with col2:
+            lerntag = Kalender.datum(eintrag["Tag"])
+            datum = st.date_input("📅 Datum", value=lerntag)
+        notiz = st.text_area("📝 Notiz (optional)", value=eintrag["Notiz"])
+        speichern = st.form_submit_button("💾 Änderungen speichern")
+
+    if speichern:
+        if not fach.strip():
+            st.warning("Bitte gib ein Fach ein.")
+            return
+        # Uhrzeit nur ersetzen, wenn wirklich ein anderer Tag gewählt wurde
+        felder = {"Datum": kalender.zeitpunkt(datum)} if datum != lerntag else {}
+        data.eintrag_aktualisieren(eintrag_id, Fach=fach.strip(), **{"Dauer (Minuten)": dauer}, Notiz=notiz, **felder)
+        st.rerun()
+
+    undo_hinweis()
+    if st.checkbox("Diesen Eintrag löschen"):
+        if st.button("🗑️ Eintrag löschen"):
+            data.eintrag_loeschen(eintrag_id)
+            st.rerun()
+
 def page_goal():
     st.subheader("🌞 Tagesziel")
 
@@ -159,8 +287,8 @@ def page_goal():
         return empty_state("Du hast noch keine Einträge. Lege zuerst einen an.", "➕ Eintrag hinzufügen", lambda: set_page("➕ Eintrag hinzufügen"))
 
     ziel_minuten = st.number_input("🎯 Tagesziel (Minuten)", min_value=10, step=10, value=90)
-    heute = date.today()
-    gesamt = df[df["Datum"].dt.date == heute]["Dauer (Minuten)"].sum()
+    heute = kalender.heute()
+    gesamt = df[df["Tag"] == Kalender.tag(heute)]["Dauer (Minuten)"].sum()
     fortschritt = 0 if ziel_minuten == 0 else min(1, gesamt / ziel_minuten)
     st.progress(int(fortschritt * 100), text=f"{int(gesamt)} / {ziel_minuten} Minuten")
 
@@ -172,7 +300,7 @@ def page_goal():
     else:
         st.warning(f"💪 Noch {ziel_minuten - int(gesamt)} Minuten bis zum Ziel.")
 
-    ziel_mgr.ziel_speichern(ziel_minuten)
+    ziel_mgr.ziel_speichern(ziel_minuten, heute)
 
 def page_heatmap():
     st.subheader("🧪 Heatmap")
@@ -184,12 +312,9 @@ def page_heatmap():
     if dff.empty:
         return empty_state("Im gewählten Zeitraum gibt es keine Daten.")
 
-    tmp = dff.copy()
-    tmp["Datum"] = pd.to_datetime(tmp["Datum"])
-    tmp["tag"] = tmp["Datum"].dt.date
-    heat = tmp.groupby("tag")["Dauer (Minuten)"].sum().reset_index()
-    heat["Wochentag"] = pd.to_datetime(heat["tag"]).dt.day_name()
-    heat["Kalenderwoche"] = pd.to_datetime(heat["tag"]).dt.isocalendar().week
+    heat = dff.groupby(["Tag", "KW"])["Dauer (Minuten)"].sum().reset_index()
+    heat["Wochentag"] = pd.to_datetime(heat["Tag"].astype("int64"), unit="D").dt.day_name()
+    heat["Kalenderwoche"] = heat["KW"] % 100
     heat["Wochentag"] = pd.Categorical(
         heat["Wochentag"],
         categories=["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"],
@@ -210,25 +335,81 @@ def page_export():
     if df.empty:
         return empty_state("Noch keine Daten zum Exportieren.")
     dff = apply_global_filter(df)
-    st.dataframe(dff, use_container_width=True)
+    # Tag/KW sind interne Schlüssel und gehören nicht in Anzeige und Export
+    sichtbar = dff.drop(columns=["Tag", "KW"])
+    st.dataframe(sichtbar, use_container_width=True)
     if dff.empty:
         return st.info("Keine Daten im gewählten Bereich.")
-    buffer, name = ExportManager.dataframe_zu_excel(dff)  # später ersetzen durch Auto-Format-Version
+    buffer, name = ExportManager.dataframe_zu_excel(sichtbar)  # später ersetzen durch Auto-Format-Version
     st.download_button("⬇️ Export als Excel", data=buffer, file_name=name,
                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
+    st.markdown("#### 📑 Bericht (mehrere Blätter)")
+    st.caption("Übersicht, ein Blatt je Fach, Wochen und Zielerreichung – wird im Hintergrund erstellt.")
+    job = st.session_state.get("bericht_job")
+    if st.button("📑 Bericht erstellen", disabled=bool(job and job.laeuft)):
+        st.session_state.bericht_job = BerichtJob(dff, ziel_mgr.get_df()).starten()
+    bericht_status()
+
+    undo_hinweis()
+    if st.checkbox(f"Alle {len(dff)} gefilterten Einträge löschen"):
+        if st.button("🗑️ Gefilterte Einträge löschen"):
+            data.eintraege_loeschen(dff["ID"].tolist())
+            st.rerun()
+
+@st.fragment(run_every=1)
+def bericht_status():
+    job = st.session_state.get("bericht_job")
+    if job is None:
+        return
+    if job.laeuft:
+        st.progress(job.fortschritt, text=job.meldung or "Bericht wird erstellt …")
+    elif job.status == "fehler":
+        st.error(f"❌ Bericht fehlgeschlagen: {job.fehler}")
+    elif job.status == "fertig":
+        st.download_button("⬇️ Bericht herunterladen", data=job.buffer, file_name=job.dateiname,
+                           mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
 def page_weekly():
     st.subheader("📅 Wochenauswertung")
     if df.empty:
         return empty_state("Keine Daten vorhanden.")
-    tmp = df.copy()
-    tmp["Datum"] = pd.to_datetime(tmp["Datum"])
-    tmp["KW"] = tmp["Datum"].dt.isocalendar().week
-    tmp["Jahr"] = tmp["Datum"].dt.year
-    g = tmp.groupby(["Jahr", "KW"])["Dauer (Minuten)"].sum().reset_index()
-    g["Label"] = g["Jahr"].astype(str) + "-KW" + g["KW"].astype(str)
+    g = auswertung.wochenreihe(df)
     st.bar_chart(g.set_index("Label")["Dauer (Minuten)"])
 
+def page_subjects():
+    st.subheader("📈 Fächeranalyse")
+    if df.empty:
+        return empty_state("Keine Daten vorhanden.")
+
+    raster = st.radio("Zeitraster", ["Woche", "Monat"], horizontal=True)
+    cube = data.wuerfel.reihe(raster, st.session_state.global_von, st.session_state.global_bis)
+    if cube.empty or cube.values.sum() == 0:
+        return empty_state("Im gewählten Zeitraum gibt es keine Daten.")
+
+    lang = cube.reset_index().melt(id_vars="Periode", var_name="Fach", value_name="Minuten")
+    fig = px.bar(lang, x="Periode", y="Minuten", color="Fach", title=f"Lernzeit pro {raster} nach Fach")
+    st.plotly_chart(fig, use_container_width=True)
+
+    col1, col2 = st.columns([1,1])
+    with col1:
+        anteil = cube.sum()
+        anteil = anteil[anteil > 0].reset_index()
+        anteil.columns = ["Fach", "Minuten"]
+        st.plotly_chart(px.pie(anteil, names="Fach", values="Minuten", title="Anteil an der Lernzeit"),
+                        use_container_width=True)
+    with col2:
+        aktuell = cube.iloc[-1]
+        vorher = cube.iloc[-2] if len(cube) > 1 else aktuell * 0
+        delta = pd.DataFrame({
+            f"Diese {raster}": aktuell,
+            f"Vorherige {raster}": vorher,
+            "Δ Minuten": aktuell - vorher,
+            "Δ %": ((aktuell - vorher) / vorher.where(vorher > 0) * 100).round(1),
+        }).sort_values("Δ Minuten", ascending=False)
+        st.markdown(f"**Veränderung zur Vor-{raster.lower()}** ({cube.index[-1]:%d.%m.%Y})")
+        st.dataframe(delta, use_container_width=True)
+
 def page_targets():
     st.subheader("📆 Zielverlauf")
     df_z = ziel_mgr.get_df()
@@ -241,15 +422,47 @@ def page_settings():
     st.subheader("⚙️ Einstellungen")
     st.session_state.auto_backup_enabled = st.checkbox(" Auto-Backup aktivieren", value=st.session_state)
 
+    st.markdown("#### 🕓 Zeitzone & Tagesbeginn")
+    st.caption("Sitzungen vor dem Tagesbeginn zählen zum Vortag (z. B. 1 Uhr nachts bei Tagesbeginn 4 Uhr).")
+    zonen = sorted(available_timezones())
+    col1, col2 = st.columns([2,1])
+    with col1:
+        zeitzone = st.selectbox("Zeitzone", zonen, index=zonen.index(kalender.zeitzone) if kalender.zeitzone in zonen else 0)
+    with col2:
+        tagesbeginn = st.number_input("Tagesbeginn (Uhr)", min_value=0, max_value=23, step=1, value=kalender.tagesbeginn)
+    if st.button("💾 Kalender speichern"):
+        data.kalender_setzen(zeitzone, tagesbeginn)
+        st.rerun()
+    st.caption(f"Aktueller Lerntag: {kalender.heute():%d.%m.%Y} · Ortszeit {kalender.jetzt():%H:%M}")
+
+    st.markdown("#### ⏲️ Hintergrundaufgaben")
+    status = pd.DataFrame(zeitplaner.status())
+    st.dataframe(status, use_container_width=True, hide_index=True)
+    aufgabe = st.selectbox("Aufgabe", list(zeitplaner.aufgaben))
+    if st.button("▶️ Jetzt ausführen"):
+        if zeitplaner.ausfuehren(aufgabe):
+            st.success(f"✅ {aufgabe} ausgeführt.")
+        else:
+            st.info(f"ℹ️ {aufgabe} läuft bereits.")
+
+    st.markdown("#### 🛡️ Datenintegrität")
+    if st.button("Prüfsummen prüfen"):
+        ergebnis = speicherformat.pruefen(data.pfad)
+        if ergebnis["version"] < speicherformat.VERSION:
+            st.info(f"Datei liegt noch im alten Format (Version {ergebnis['version']}) vor.")
+        elif ergebnis["defekt"]:
+            st.warning(f"{ergebnis['defekt']} von {ergebnis['bloecke']} Blöcken sind beschädigt.")
+        else:
+            st.success(f"✅ Alle {ergebnis['bloecke']} Blöcke sind in Ordnung (Format Version {ergebnis['version']}).")
+
 def page_reset():
     st.subheader("🗑️ Datenbank löschen")
-    st.warning("⚠️ Diese Aktion löscht alle Daten unwiderruflich.")
+    undo_hinweis()
+    st.warning("⚠️ Diese Aktion leert Einträge und Tagesziele. Die Daten werden archiviert und können 24 Stunden lang wiederhergestellt werden.")
     if st.checkbox("Ich bin sicher"):
         if st.button("🔥 Jetzt löschen"):
-            data.df = pd.DataFrame(columns=["ID","Fach","Dauer (Minuten)","Datum","Notiz","Tagesziel"])
-            data.speichern()
-            ziel_mgr.df = pd.DataFrame(columns=["Datum","Tagesziel"])
-            ziel_mgr.df.to_csv(ziel_mgr.pfad, index=False)
+            data.zuruecksetzen(weitere_dateien=[ziel_mgr.pfad])
+            ziel_mgr._lade_oder_erzeuge()
             st.success("✅ Alle Daten wurden gelöscht.")
             st.rerun()
 
@@ -270,8 +483,10 @@ with st.sidebar:
 page_map = {
     "📊 Übersicht": page_overview,
     "➕ Eintrag hinzufügen": page_add,
+    "✏️ Einträge bearbeiten": page_edit,
     "🌞 Tagesziel": page_goal,
     "📅 Wochenauswertung": page_weekly,
+    "📈 Fächeranalyse": page_subjects,
     "🧪 Heatmap": page_heatmap,
     "🔎 Filter & Export": page_export,
     "📆 Zielverlauf": page_targets,
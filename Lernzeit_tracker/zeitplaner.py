@@ -0,0 +1,225 @@
+# zeitplaner.py
+# Leichtgewichtiger Zeitplaner für wiederkehrende Arbeiten außerhalb des Seitenaufbaus:
+# ein Daemon-Thread prüft regelmäßig, welche Aufgaben fällig sind, und merkt sich den
+# letzten Lauf samt Laufzeit in einer JSON-Datei (überlebt Neustarts).
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bericht_manager import bericht_erstellen
+from ziel_manager import ZielVerwaltung
+
+TAKT_SEKUNDEN = 30
+# Ältere Sperrdateien gelten als verwaist (z. B. nach einem Absturz)
+SPERRE_VERWAIST_NACH = timedelta(hours=2)
+
+log = logging.getLogger(__name__)
+
+
+class Aufgabe:
+    def __init__(self, name, funktion, intervall=None, taeglich_um=None):
+        if intervall is None and taeglich_um is None:
+            raise ValueError("intervall oder taeglich_um angeben")
+        self.name = name
+        self.funktion = funktion
+        self.intervall = intervall
+        self.taeglich_um = taeglich_um
+        self._sperre = threading.Lock()
+
+    def faellig(self, jetzt, letzter_lauf):
+        if letzter_lauf is None:
+            return self.taeglich_um is None or jetzt.hour >= self.taeglich_um
+        if self.taeglich_um is not None:
+            return letzter_lauf.date() < jetzt.date() and jetzt.hour >= self.taeglich_um
+        return jetzt - letzter_lauf >= self.intervall
+
+
+class Zeitplaner:
+    def __init__(self, status_pfad="zeitplan_status.json", takt=TAKT_SEKUNDEN):
+        self.status_pfad = status_pfad
+        self.sperr_verzeichnis = os.path.splitext(status_pfad)[0] + "_sperren"
+        self.takt = takt
+        self.aufgaben = {}
+        self._status = self._status_lesen()
+        self._status_sperre = threading.Lock()
+        self._stopp = threading.Event()
+        self._thread = None
+
+    # ------------- Status -------------
+    def _status_lesen(self):
+        try:
+            with open(self.status_pfad, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _status_zusammenfuehren(self):
+        # Je Aufgabe gewinnt der jüngere Lauf, egal ob aus diesem oder einem anderen Prozess
+        for name, eintrag in self._status_lesen().items():
+            eigener = self._status.get(name, {})
+            if (eintrag.get("letzter_lauf") or "") >= (eigener.get("letzter_lauf") or ""):
+                self._status[name] = eintrag
+
+    def _status_schreiben(self):
+        # Eigene temporäre Datei je Schreibvorgang im selben Verzeichnis, sonst stören sich Threads/Prozesse
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self.status_pfad) + ".",
+                                   suffix=".tmp", dir=os.path.dirname(os.path.abspath(self.status_pfad)))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._status, f, indent=2)
+            os.replace(tmp, self.status_pfad)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _letzter_lauf(self, name):
+        wert = self._status.get(name, {}).get("letzter_lauf")
+        return datetime.fromisoformat(wert) if wert else None
+
+    def status(self):
+        with self._status_sperre:
+            return [
+                {"Aufgabe": name, **self._status.get(name, {})}
+                for name in self.aufgaben
+            ]
+
+    # ------------- Sperren -------------
+    def _prozess_sperre(self, name):
+        # Sperrdatei per O_EXCL: verhindert parallele Läufe auch über mehrere Prozesse hinweg
+        os.makedirs(self.sperr_verzeichnis, exist_ok=True)
+        pfad = os.path.join(self.sperr_verzeichnis, f"{name}.lock")
+        try:
+            alter = datetime.now() - datetime.fromtimestamp(os.path.getmtime(pfad))
+            if alter > SPERRE_VERWAIST_NACH:
+                os.remove(pfad)
+        except OSError:
+            pass
+        try:
+            fd = os.open(pfad, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return None
+        with os.fdopen(fd, "w") as f:
+            f.write(f"{os.getpid()} {datetime.now().isoformat()}")
+        return pfad
+
+    # ------------- Ausführung -------------
+    def registrieren(self, name, funktion, intervall=None, taeglich_um=None):
+        self.aufgaben[name] = Aufgabe(name, funktion, intervall, taeglich_um)
+
+    def ausfuehren(self, name, nur_wenn_faellig=False):
+        # Gibt False zurück, wenn die Aufgabe bereits (in diesem oder einem anderen Prozess) läuft
+        aufgabe = self.aufgaben[name]
+        if not aufgabe._sperre.acquire(blocking=False):
+            return False
+        try:
+            sperrdatei = self._prozess_sperre(name)
+            if sperrdatei is None:
+                return False
+            if nur_wenn_faellig:
+                # Ein anderer Prozess kann die Aufgabe inzwischen erledigt haben
+                with self._status_sperre:
+                    self._status_zusammenfuehren()
+                if not aufgabe.faellig(datetime.now(), self._letzter_lauf(name)):
+                    os.remove(sperrdatei)
+                    return False
+            start = time.perf_counter()
+            fehler = None
+            try:
+                ergebnis = aufgabe.funktion()
+            except Exception as e:
+                ergebnis = None
+                fehler = f"{type(e).__name__}: {e}"
+            finally:
+                os.remove(sperrdatei)
+            dauer = time.perf_counter() - start
+            with self._status_sperre:
+                self._status_zusammenfuehren()
+                eintrag = self._status.setdefault(name, {"laeufe": 0, "fehler": 0})
+                eintrag["letzter_lauf"] = datetime.now().isoformat(timespec="seconds")
+                eintrag["dauer_s"] = round(dauer, 3)
+                eintrag["max_dauer_s"] = round(max(dauer, eintrag.get("max_dauer_s", 0)), 3)
+                eintrag["laeufe"] += 1
+                eintrag["fehler"] += fehler is not None
+                eintrag["letzter_fehler"] = fehler
+                eintrag["ergebnis"] = None if ergebnis is None else str(ergebnis)
+                self._status_schreiben()
+            return True
+        finally:
+            aufgabe._sperre.release()
+
+    def faellige_ausfuehren(self, jetzt=None):
+        jetzt = jetzt or datetime.now()
+        for name, aufgabe in self.aufgaben.items():
+            if self._stopp.is_set():
+                break
+            if aufgabe.faellig(jetzt, self._letzter_lauf(name)):
+                self.ausfuehren(name, nur_wenn_faellig=True)
+
+    def _schleife(self):
+        while not self._stopp.is_set():
+            # Ein Fehler außerhalb der Aufgaben (z. B. Status-Datei) darf den Thread nicht beenden
+            try:
+                self.faellige_ausfuehren()
+            except Exception:
+                log.exception("Zeitplaner-Durchlauf fehlgeschlagen")
+            self._stopp.wait(self.takt)
+
+    def starten(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopp.clear()
+            self._thread = threading.Thread(target=self._schleife, name="lernzeit-zeitplaner", daemon=True)
+            self._thread.start()
+        return self
+
+    def stoppen(self):
+        self._stopp.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.takt)
+
+
+# ------------- Standard-Aufgaben der App -------------
+def _snapshot(daten, verzeichnis, behalten):
+    # Ein Unterordner pro Snapshot mit CSV und (falls vorhanden) Journal
+    ziel = os.path.join(verzeichnis, f"{datetime.now():%Y%m%d_%H%M%S}")
+    os.makedirs(ziel, exist_ok=True)
+    with daten.sperre:
+        for pfad in (daten.pfad, daten.journal_pfad):
+            if os.path.exists(pfad):
+                shutil.copy2(pfad, ziel)
+    alte = sorted(d for d in os.listdir(verzeichnis) if os.path.isdir(os.path.join(verzeichnis, d)))
+    for ordner in alte[:-behalten]:
+        shutil.rmtree(os.path.join(verzeichnis, ordner))
+    return ziel
+
+
+def _bericht(daten, ziel_pfad, verzeichnis, behalten):
+    with daten.sperre:
+        df = daten.df.copy()
+    if df.empty:
+        return "keine Daten"
+    buffer, dateiname = bericht_erstellen(df, ZielVerwaltung(ziel_pfad).get_df())
+    os.makedirs(verzeichnis, exist_ok=True)
+    with open(os.path.join(verzeichnis, dateiname), "wb") as f:
+        f.write(buffer.getvalue())
+    alte = sorted(f for f in os.listdir(verzeichnis) if f.startswith("lernzeit_bericht_"))
+    for datei in alte[:-behalten]:
+        os.remove(os.path.join(verzeichnis, datei))
+    return dateiname
+
+
+def standard_zeitplaner(daten, ziel_pfad="ziele.csv", basis="."):
+    planer = Zeitplaner(os.path.join(basis, "zeitplan_status.json"))
+    planer.registrieren("Kompaktierung", daten.kompaktieren, taeglich_um=3)
+    planer.registrieren("Rollup-Aktualisierung", daten.rollups_neu_aufbauen, intervall=timedelta(hours=1))
+    planer.registrieren("Spalten-Cache", daten.cache_aktualisieren, intervall=timedelta(hours=1))
+    planer.registrieren("Snapshot", lambda: _snapshot(daten, os.path.join(basis, "snapshots"), 14),
+                        taeglich_um=2)
+    planer.registrieren("Bericht", lambda: _bericht(daten, ziel_pfad, os.path.join(basis, "berichte"), 8),
+                        intervall=timedelta(days=7))
+    return planer
@@ -15,8 +15,9 @@ class ZielVerwaltung:
             self.df = pd.DataFrame(columns=["Datum", "Tagesziel"])
             self.df.to_csv(self.pfad, index=False)
 
-    def ziel_speichern(self, ziel_minuten):
-        heute = pd.to_datetime(date.today())
+    def ziel_speichern(self, ziel_minuten, heute=None):
+        # heute: aktueller Lerntag (berücksichtigt Zeitzone und Tagesbeginn)
+        heute = pd.to_datetime(heute or date.today())
         if not (self.df["Datum"] == heute).any():
             neu = pd.DataFrame([[heute, ziel_minuten]], columns=["Datum", "Tagesziel"])
             self.df = pd.concat([self.df, neu], ignore_index=True)
@@ -0,0 +1,149 @@
+# laden_benchmark.py
+# Vergleicht den ursprünglichen Lader (ganze CSV lesen, danach filtern) mit dem
+# gestückelten Lader aus data_manager (Filter beim Lesen) auf großen Dateien.
+#
+#   python benchmarks/laden_benchmark.py --mb 300
+#
+# Jede Messung läuft in einem eigenen Prozess, damit der Spitzen-Speicher (maxrss)
+# nicht von vorherigen Läufen verfälscht wird.
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Lernzeit_tracker"))
+
+import speicherformat
+from data_manager import SPALTEN, AUFBEWAHRUNG_TAGE, lade_eintraege
+
+FAECHER = ["Mathe", "Deutsch", "Englisch", "Physik", "Chemie", "Biologie", "Geschichte", "Informatik"]
+ZEILEN_PRO_SCHRITT = 200_000
+
+
+def testdaten(zeilen, jahre, rng):
+    heute = np.datetime64(datetime.today().date())
+    tage = rng.integers(0, 365 * jahre, zeilen)
+    return pd.DataFrame({
+        "ID": [str(uuid.uuid4()) for _ in range(zeilen)],
+        "Fach": rng.choice(FAECHER, zeilen),
+        "Dauer (Minuten)": rng.integers(5, 180, zeilen),
+        "Datum": (heute - tage.astype("timedelta64[D]")).astype("datetime64[s]"),
+        "Notiz": rng.choice(["", "Kapitel wiederholt", "Übungsblatt, Aufgabe 3", "Karteikarten"], zeilen),
+        "Tagesziel": 90,
+    }, columns=SPALTEN)
+
+
+def datei_erzeugen(pfad, mb, jahre, format_v2, notiz_leer=False):
+    rng = np.random.default_rng(42)
+    ziel = mb * 1024 * 1024
+    erster = True
+    while not os.path.exists(pfad) or os.path.getsize(pfad) < ziel:
+        teil = testdaten(ZEILEN_PRO_SCHRITT, jahre, rng)
+        if notiz_leer:
+            teil["Notiz"] = ""
+        if format_v2:
+            (speicherformat.schreiben if erster else speicherformat.anhaengen)(pfad, teil)
+        else:
+            teil.to_csv(pfad, mode="w" if erster else "a", header=erster, index=False)
+        erster = False
+    if notiz_leer:
+        # Nur die letzte Zeile hat eine Notiz: alle Blöcke davor sind in dieser Spalte leer
+        letzte = testdaten(1, jahre, rng).assign(Notiz="späte Notiz", Datum=datetime.today().strftime("%Y-%m-%d"))
+        letzte.to_csv(pfad, mode="a", header=False, index=False)
+
+
+def alt_laden(pfad):
+    # Entspricht dem ursprünglichen LernzeitDaten._lade_oder_erzeuge_csv (v2: ganze Datei ohne Filter lesen)
+    df = speicherformat.lesen(pfad)[0] if speicherformat.ist_v2(pfad) else pd.read_csv(pfad)
+    df["Datum"] = pd.to_datetime(df["Datum"], errors="coerce")
+    df = df.dropna(subset=["Datum"])
+    sechs_monate_zurueck = datetime.today() - timedelta(days=AUFBEWAHRUNG_TAGE)
+    return df[df["Datum"] >= sechs_monate_zurueck]
+
+
+def neu_laden(pfad, faecher=None):
+    von = pd.Timestamp(datetime.today() - timedelta(days=AUFBEWAHRUNG_TAGE))
+    df, _ = lade_eintraege(pfad, von=von, faecher=faecher)
+    return df
+
+
+def spitzen_speicher():
+    spitze = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return spitze if sys.platform == "darwin" else spitze * 1024
+
+
+def aktueller_speicher():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return spitzen_speicher()
+
+
+def messen(modus, pfad, faecher):
+    vorher = aktueller_speicher()
+    start = time.perf_counter()
+    if modus == "alt":
+        df = alt_laden(pfad)
+        if faecher:
+            df = df[df["Fach"].isin(faecher)]
+    else:
+        df = neu_laden(pfad, faecher)
+    dauer = time.perf_counter() - start
+    # Zuwachs gegenüber dem Stand nach den Imports
+    print(f"{dauer:.3f} {spitzen_speicher() - vorher} {len(df)}")
+
+
+def lauf(modus, pfad, faecher):
+    befehl = [sys.executable, __file__, "--messen", modus, "--datei", pfad]
+    if faecher:
+        befehl += ["--faecher", ",".join(faecher)]
+    dauer, spitze, zeilen = subprocess.check_output(befehl, text=True).split()
+    return float(dauer), int(spitze) / 1024 / 1024, int(zeilen)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark: CSV-Lader alt vs. gestückelt")
+    parser.add_argument("--mb", type=int, default=300, help="Größe der Testdatei in MB")
+    parser.add_argument("--jahre", type=int, default=5, help="Zeitraum der Testdaten in Jahren")
+    parser.add_argument("--verzeichnis", default=None, help="Ablage der Testdateien (Standard: temporär)")
+    parser.add_argument("--messen", choices=["alt", "neu"], help=argparse.SUPPRESS)
+    parser.add_argument("--datei", help=argparse.SUPPRESS)
+    parser.add_argument("--faecher", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.messen:
+        return messen(args.messen, args.datei, args.faecher.split(",") if args.faecher else None)
+
+    verzeichnis = args.verzeichnis or tempfile.mkdtemp(prefix="lernzeit_bench_")
+    os.makedirs(verzeichnis, exist_ok=True)
+    dateien = {
+        "CSV v1": os.path.join(verzeichnis, f"daten_v1_{args.mb}mb.csv"),
+        "CSV v2": os.path.join(verzeichnis, f"daten_v2_{args.mb}mb.csv"),
+        # Alte CSV, deren Notiz-Spalte erst in der letzten Zeile gefüllt ist
+        "CSV v1 leer": os.path.join(verzeichnis, f"daten_v1_leer_{args.mb}mb.csv"),
+    }
+    for name, pfad in dateien.items():
+        if not os.path.exists(pfad):
+            print(f"Erzeuge {name} ({args.mb} MB) unter {pfad} ...", flush=True)
+            datei_erzeugen(pfad, args.mb, args.jahre, format_v2=name == "CSV v2", notiz_leer=name.endswith("leer"))
+
+    print(f"\n{'Datei':<11} {'Filter':<12} {'Lader':<6} {'Zeit (s)':>9} {'+Spitze (MB)':>12} {'Zeilen':>10}")
+    for name, pfad in dateien.items():
+        for faecher in (None, ["Mathe"]):
+            for modus in ("alt", "neu"):
+                dauer, spitze, zeilen = lauf(modus, pfad, faecher)
+                filtertext = ",".join(faecher) if faecher else "180 Tage"
+                print(f"{name:<11} {filtertext:<12} {modus:<6} {dauer:>9.2f} {spitze:>12.0f} {zeilen:>10}")
+
+
+if __name__ == "__main__":
+    main()
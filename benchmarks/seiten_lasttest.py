@@ -0,0 +1,274 @@
+# seiten_lasttest.py
+# Last- und Eigenschaftstest für die Streamlit-Seiten: tracker_app.py wird mit AppTest
+# (ohne Browser) gegen zufällig erzeugte Datensätze wachsender Größe ausgeführt.
+#
+#   python benchmarks/seiten_lasttest.py --zeilen 1000,10000,100000 --budget-ms 2000
+#   python benchmarks/seiten_lasttest.py --seiten-budget "Filter & Export=5000" --seed 7
+#   python benchmarks/seiten_lasttest.py --tagesbeginn 4      (Sitzungen vor 4 Uhr zählen zum Vortag)
+#
+# Pro Seite wird die Rerun-Latenz gemessen (Median über --wiederholungen) und das Ergebnis
+# gegen eine unabhängige Referenzrechnung mit pandas geprüft: KPI-Summen, Wochenbalken,
+# Heatmap-Zellen und Zeilenzahlen im Export (auch mit Fach- und Notizfilter).
+# Der Exit-Code ist 1, sobald eine Prüfung fehlschlägt oder ein Budget überschritten wird.
+#
+# Jede Datensatzgröße läuft in einem eigenen Prozess und Verzeichnis, damit sich die
+# st.cache_resource-Instanzen (Daten, Zeitplaner) nicht zwischen den Größen vermischen.
+import argparse
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Lernzeit_tracker"))
+
+import speicherformat
+from data_manager import SPALTEN, AUFBEWAHRUNG_TAGE
+from kalender import Kalender
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Lernzeit_tracker", "tracker_app.py")
+FAECHER = ["Mathe", "Deutsch", "Englisch", "Physik", "Französisch", "Biologie", "Geschichte", "Informatik"]
+WOERTER = ["Kapitel", "wiederholt", "Übungsblatt", "Aufgabe", "Karteikarten", "Klausur", "Vokabeln", "Café"]
+ZEITPLAN_AUFGABEN = ["Kompaktierung", "Rollup-Aktualisierung", "Spalten-Cache", "Snapshot", "Bericht"]
+
+
+# ------------- Testdaten & Referenz -------------
+def datensatz(zeilen, seed, heute):
+    rng = np.random.default_rng(seed)
+    # Innerhalb des Aufbewahrungsfensters, damit alle Zeilen geladen werden; heute ist immer dabei
+    tage = rng.integers(0, AUFBEWAHRUNG_TAGE - 10, zeilen)
+    tage[: max(1, zeilen // 100)] = 0
+    sekunden = rng.integers(0, 24 * 3600, zeilen)
+    datum = np.datetime64(heute) - tage.astype("timedelta64[D]") + sekunden.astype("timedelta64[s]")
+    notizen = [" ".join(rng.choice(WOERTER, rng.integers(0, 4))) for _ in range(zeilen)]
+    return pd.DataFrame({
+        "ID": [str(uuid.uuid4()) for _ in range(zeilen)],
+        "Fach": rng.choice(FAECHER, zeilen),
+        "Dauer (Minuten)": rng.integers(5, 180, zeilen),
+        "Datum": datum.astype("datetime64[s]"),
+        "Notiz": notizen,
+        "Tagesziel": 90,
+    }, columns=SPALTEN)
+
+
+def vorbereiten(verzeichnis, df, kalender):
+    os.makedirs(verzeichnis, exist_ok=True)
+    speicherformat.schreiben(os.path.join(verzeichnis, "daten.csv"), df)
+    kalender.speichern(os.path.join(verzeichnis, "daten_kalender.json"))
+    # Alle Hintergrundaufgaben als gerade gelaufen markieren, sonst verfälschen sie die Messung
+    jetzt = datetime.now().isoformat(timespec="seconds")
+    status = {name: {"letzter_lauf": jetzt, "laeufe": 0, "fehler": 0} for name in ZEITPLAN_AUFGABEN}
+    with open(os.path.join(verzeichnis, "zeitplan_status.json"), "w", encoding="utf-8") as f:
+        json.dump(status, f)
+
+
+def referenz(df, heute, tagesbeginn):
+    # Lerntag unabhängig von kalender.py nachgerechnet: vor dem Tagesbeginn zählt der Vortag,
+    # reine Datumsangaben (00:00) bleiben auf ihrem Datum
+    nur_datum = df["Datum"] == df["Datum"].dt.normalize()
+    lerntag = df["Datum"].where(nur_datum, df["Datum"] - pd.Timedelta(hours=tagesbeginn)).dt.normalize()
+    tage = lerntag.dt.date
+    wochenstart = heute - timedelta(days=heute.weekday())
+    kw = lerntag.dt.isocalendar()
+    wochen = df.groupby([kw["year"], kw["week"]])["Dauer (Minuten)"].sum()
+    zellen = df.groupby([kw["week"], lerntag.dt.day_name()])["Dauer (Minuten)"].sum()
+    return {
+        "kpi": {
+            "Heute": int(df.loc[tage == heute, "Dauer (Minuten)"].sum()),
+            "Diese Woche": int(df.loc[tage >= wochenstart, "Dauer (Minuten)"].sum()),
+            "Gesamt": int(df["Dauer (Minuten)"].sum()),
+        },
+        "wochen": {f"{j}-KW{w}": int(m) for (j, w), m in wochen.items()},
+        "heatmap": {(int(w), t): int(m) for (w, t), m in zellen.items()},
+        "zeilen": len(df),
+        "je_fach": df["Fach"].value_counts().to_dict(),
+        "notiz": {w: int(df["Notiz"].str.split().apply(lambda n, w=w: w in n).sum()) for w in WOERTER},
+    }
+
+
+# ------------- Auslesen der AppTest-Elemente -------------
+def _plotly_werte(wert):
+    # Plotly serialisiert numerische Arrays als {"dtype": ..., "bdata": base64}
+    if isinstance(wert, dict):
+        return np.frombuffer(base64.b64decode(wert["bdata"]), dtype=wert["dtype"]).tolist()
+    return list(wert)
+
+
+def _vega_daten(element):
+    import pyarrow as pa
+    return pa.ipc.open_stream(element.proto.datasets[0].data.data).read_all().to_pandas()
+
+
+def _vergleichen(fehler, seite, was, ist, soll):
+    if ist != soll:
+        fehler.append(f"{seite}: {was} weicht ab (App {ist!r} ≠ Referenz {soll!r})"[:400])
+
+
+def pruefen_uebersicht(at, ref, fehler, seite):
+    werte = {m.label: int(str(m.value).split()[0]) for m in at.metric if m.label in ref["kpi"]}
+    _vergleichen(fehler, seite, "KPI", werte, ref["kpi"])
+
+
+def pruefen_wochen(at, ref, fehler, seite):
+    g = _vega_daten(at.get("vega_lite_chart")[0])
+    _vergleichen(fehler, seite, "Wochenbalken", dict(zip(g["Label"], g["Dauer (Minuten)"].astype(int))), ref["wochen"])
+
+
+def pruefen_heatmap(at, ref, fehler, seite):
+    spur = json.loads(at.get("plotly_chart")[0].proto.spec)["data"][0]
+    zellen = pd.DataFrame({"x": _plotly_werte(spur["x"]), "y": _plotly_werte(spur["y"]), "z": _plotly_werte(spur["z"])})
+    ist = {(int(x), y): int(z) for (x, y), z in zellen.groupby(["x", "y"])["z"].sum().items()}
+    _vergleichen(fehler, seite, "Heatmap-Zellen", ist, ref["heatmap"])
+
+
+def _widget(at, art, label):
+    # Nach jedem run() neu suchen: die Elemente des vorherigen Laufs sind veraltet
+    return next(w for w in getattr(at.sidebar, art) if w.label == label)
+
+
+def _export_zeilen(at):
+    return len(at.dataframe[0].value) if at.dataframe else 0
+
+
+def pruefen_export(at, ref, fehler, seite):
+    _vergleichen(fehler, seite, "Zeilen", _export_zeilen(at), ref["zeilen"])
+    # Eigenschaft: Fachfilter liefert genau die Zeilen dieses Fachs
+    fach = sorted(ref["je_fach"])[0]
+    _widget(at, "selectbox", "Fach").set_value(fach).run()
+    _vergleichen(fehler, seite, f"Zeilen (Fach {fach})", _export_zeilen(at), ref["je_fach"][fach])
+    _widget(at, "selectbox", "Fach").set_value("Alle").run()
+    # Eigenschaft: Notizsuche (ganzes Wort) entspricht einem Wortvergleich auf den Rohdaten
+    _widget(at, "checkbox", "Auch Wortanfänge finden").uncheck().run()
+    for wort in ("Klausur", "Übungsblatt"):
+        _widget(at, "text_input", "Notiz enthält").input(wort).run()
+        _vergleichen(fehler, seite, f"Zeilen (Notiz „{wort}“)", _export_zeilen(at), ref["notiz"][wort])
+    _widget(at, "text_input", "Notiz enthält").input("").run()
+
+
+PRUEFUNGEN = {
+    "Übersicht": pruefen_uebersicht,
+    "Wochenauswertung": pruefen_wochen,
+    "Heatmap": pruefen_heatmap,
+    "Filter & Export": pruefen_export,
+}
+
+
+# ------------- Messung (läuft im Kindprozess) -------------
+def messen(zeilen, seed, wiederholungen, verzeichnis, tagesbeginn):
+    from streamlit.testing.v1 import AppTest
+
+    kalender = Kalender(tagesbeginn=tagesbeginn)
+    heute = kalender.heute()
+    df = datensatz(zeilen, seed, heute)
+    vorbereiten(verzeichnis, df, kalender)
+    ref = referenz(df, heute, tagesbeginn)
+    os.chdir(verzeichnis)
+
+    ergebnisse = []
+    seiten = AppTest.from_file(APP, default_timeout=600).run().sidebar.radio[0].options
+    for seite in seiten:
+        at = AppTest.from_file(APP, default_timeout=600)
+        at.session_state["page"] = seite
+        start = time.perf_counter()
+        at.run()
+        erster = time.perf_counter() - start
+        laeufe = []
+        for _ in range(wiederholungen):
+            start = time.perf_counter()
+            at.run()
+            laeufe.append(time.perf_counter() - start)
+        fehler = [f"{seite}: Exception {e.value}" for e in at.exception]
+        pruefung = next((f for name, f in PRUEFUNGEN.items() if name in seite), None)
+        if pruefung and not fehler:
+            try:
+                pruefung(at, ref, fehler, seite)
+            except Exception as e:
+                fehler.append(f"{seite}: Prüfung abgebrochen ({type(e).__name__}: {e})")
+        ergebnisse.append({
+            "seite": seite,
+            "erster_ms": erster * 1000,
+            "median_ms": statistics.median(laeufe) * 1000,
+            "max_ms": max(laeufe) * 1000,
+            "geprueft": pruefung is not None,
+            "fehler": fehler,
+        })
+    print(json.dumps(ergebnisse))
+
+
+def lauf(zeilen, seed, wiederholungen, verzeichnis, tagesbeginn):
+    befehl = [sys.executable, __file__, "--messen", str(zeilen), "--seed", str(seed),
+              "--wiederholungen", str(wiederholungen), "--verzeichnis", verzeichnis,
+              "--tagesbeginn", str(tagesbeginn)]
+    ausgabe = subprocess.run(befehl, capture_output=True, text=True)
+    if ausgabe.returncode != 0:
+        return None, ausgabe.stderr.strip().splitlines()[-20:]
+    return json.loads(ausgabe.stdout.strip().splitlines()[-1]), []
+
+
+def _budgets(eintraege):
+    budgets = {}
+    for eintrag in eintraege:
+        name, _, wert = eintrag.rpartition("=")
+        if not name:
+            raise SystemExit(f"--seiten-budget erwartet SEITE=MS, nicht {eintrag!r}")
+        budgets[name.strip()] = float(wert)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Last- und Eigenschaftstest der Streamlit-Seiten (AppTest)")
+    parser.add_argument("--zeilen", default="1000,10000,100000", help="Datensatzgrößen, kommagetrennt")
+    parser.add_argument("--wiederholungen", type=int, default=3, help="Reruns pro Seite")
+    parser.add_argument("--budget-ms", type=float, default=2000, help="Budget für den Median-Rerun jeder Seite")
+    parser.add_argument("--seiten-budget", action="append", default=[],
+                        help="Abweichendes Budget, z. B. \"Heatmap=3000\" (Teil des Seitennamens, mehrfach möglich)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tagesbeginn", type=int, default=0, help="Tagesbeginn in Uhr für Lerntage")
+    parser.add_argument("--verzeichnis", default=None, help="Ablage der Testdaten (Standard: temporär)")
+    parser.add_argument("--messen", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.messen:
+        return messen(args.messen, args.seed, args.wiederholungen, args.verzeichnis, args.tagesbeginn)
+
+    budgets = _budgets(args.seiten_budget)
+    basis = args.verzeichnis or tempfile.mkdtemp(prefix="lernzeit_seiten_")
+    verstoesse = []
+    print(f"{'Zeilen':>8}  {'Seite':<26} {'Erster (ms)':>11} {'Median (ms)':>11} {'Max (ms)':>9} {'Budget':>7}  Ergebnis")
+    for i, zeilen in enumerate(int(z) for z in args.zeilen.split(",")):
+        verzeichnis = os.path.join(basis, f"{zeilen}_zeilen")
+        ergebnisse, stderr = lauf(zeilen, args.seed + i, args.wiederholungen, verzeichnis, args.tagesbeginn)
+        if ergebnisse is None:
+            verstoesse.append(f"{zeilen} Zeilen: Messprozess abgebrochen")
+            print(f"{zeilen:>8}  Messprozess abgebrochen:\n    " + "\n    ".join(stderr))
+            continue
+        for r in ergebnisse:
+            budget = next((ms for name, ms in budgets.items() if name in r["seite"]), args.budget_ms)
+            status = "ok" if r["geprueft"] else "ok (nur Latenz)"
+            if r["fehler"]:
+                status = "FEHLER"
+                verstoesse += [f"{zeilen} Zeilen – {f}" for f in r["fehler"]]
+            if r["median_ms"] > budget:
+                status = "ZU LANGSAM" if status != "FEHLER" else status
+                verstoesse.append(f"{zeilen} Zeilen – {r['seite']}: {r['median_ms']:.0f} ms > {budget:.0f} ms")
+            print(f"{zeilen:>8}  {r['seite']:<26} {r['erster_ms']:>11.0f} {r['median_ms']:>11.0f} "
+                  f"{r['max_ms']:>9.0f} {budget:>7.0f}  {status}")
+
+    if verstoesse:
+        print(f"\n{len(verstoesse)} Verstöße:")
+        for v in verstoesse:
+            print(f"  - {v}")
+        sys.exit(1)
+    print("\nAlle Seiten innerhalb der Budgets und konsistent mit der Referenz.")
+
+
+if __name__ == "__main__":
+    main()